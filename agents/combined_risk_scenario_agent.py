@@ -0,0 +1,114 @@
+"""
+Combined Risk + Scenario Agent
+
+Responsibility: Identify key risks and generate Bull/Base/Bear scenarios
+with a single Gemini request over the shared market/macro/risk context.
+"""
+
+import time
+from typing import Dict, Any
+from schemas.state import ResearchState, record_agent_timing, build_prompt_context
+from services.logger import logger, FLUSH
+from tools.risk_metrics import get_risk_metrics
+from agents.scenario_agent import default_scenarios, normalize_scenarios, SCENARIO_SCHEMA
+from services.llm_service import get_gemini_service, PromptPrefix, JSON_MAX_OUTPUT_TOKENS
+
+
+# Gemini JSON-mode response schema (the risk_agent and scenario_agent outputs)
+COMBINED_SCHEMA = {
+    "type": "OBJECT",
+    "properties": {
+        "key_risks": {"type": "ARRAY", "items": {"type": "STRING"}},
+        "scenarios": SCENARIO_SCHEMA
+    },
+    "required": ["key_risks", "scenarios"]
+}
+
+# Static instructions - identical across tickers, so sent first
+COMBINED_PREFIX = PromptPrefix("risk_scenario", """You are a risk analyst and equity strategist. Identify the key risks
+and generate Bull/Base/Bear scenarios for the stock described below.
+
+Constraints:
+- key_risks: 2-5 concise risks
+- scenario prob values must sum to 1.0
+- scenario return values as decimals (e.g., 0.25 for 25%)
+
+""")
+
+
+def combined_risk_scenario_agent(state: ResearchState) -> ResearchState:
+    """
+    Combined Risk + Scenario Agent - one LLM round-trip for both outputs.
+
+    Args:
+        state: Current research state
+
+    Returns:
+        Updated state with risk_analysis and scenarios populated
+    """
+    agent_start = time.time()
+    ticker = state.get("ticker", "")
+
+    if not ticker:
+        state["risk_analysis"] = {"error": "No ticker provided"}
+        state["scenarios"] = default_scenarios()
+        return state
+
+    logger.info("\n[Risk Analyst Agent] Computing risk metrics for %s...", ticker)
+
+    # Get risk metrics
+    risk_metrics = get_risk_metrics(ticker)
+
+    ctx = build_prompt_context(state)
+
+    llm_time = 0.0
+    try:
+        gemini = get_gemini_service()
+        logger.info("[Risk Analyst Agent] Calling Gemini API (risks + scenarios)...")
+        llm_start = time.time()
+
+        prompt = f"""Analyze risk and generate scenarios for {ctx.ticker} ({ctx.horizon}-term horizon):
+Market Data:
+- Price Trend: {ctx.price_trend}
+- P/E Ratio: {ctx.pe_ratio}
+- RSI: {ctx.rsi}
+
+Macro Environment:
+- Interest Rate Trend: {ctx.interest_rate_trend}
+- Inflation Trend: {ctx.inflation_trend}
+- Market Trend: {ctx.market_trend}
+
+Risk Metrics:
+- Volatility: {risk_metrics.get('volatility', 'Unknown')}
+- Beta: {risk_metrics.get('beta', 'Unknown')}
+- Drawdown: {risk_metrics.get('drawdown', 'Unknown')}"""
+
+        # Dynamic tail only - instructions live in COMBINED_PREFIX, schema in COMBINED_SCHEMA
+        result = gemini.invoke_json(prompt, temperature=0.1, max_tokens=JSON_MAX_OUTPUT_TOKENS,
+                                    schema=COMBINED_SCHEMA, prefix=COMBINED_PREFIX)
+        llm_time = time.time() - llm_start
+        logger.info("[OK] Risk + scenario analysis complete in %.1fs", llm_time)
+
+        key_risks = result.get("key_risks") or ["Unable to identify risks"]
+        scenarios = result.get("scenarios") or {}
+
+        # Validate and normalize probabilities after the parse
+        state["scenarios"] = normalize_scenarios(scenarios)
+    except Exception as e:
+        logger.error("Error in combined risk/scenario analysis: %s", e)
+        key_risks = ["Unable to identify risks"]
+        state["scenarios"] = default_scenarios()
+
+    state["risk_analysis"] = {
+        **risk_metrics,
+        "key_risks": key_risks[:5]  # Limit to 5 risks
+    }
+
+    agent_time = time.time() - agent_start
+    logger.info("[Risk Analyst Agent] Complete in %.1fs (LLM: %.1fs). Volatility: %s",
+                agent_time, llm_time, risk_metrics.get('volatility', 'Unknown'), extra=FLUSH)
+
+    # Store timing
+    record_agent_timing(state, risk_scenario=agent_time, risk_scenario_llm=llm_time)
+
+    return state
@@ -4,11 +4,40 @@ Macro Trends Agent
 Responsibility: Analyze macroeconomic trends and sector performance.
 """
 
+import os
 import time
+import asyncio
 from typing import Dict, Any
-from schemas.state import ResearchState
-from tools.macro_data import get_macro_data
-from tools.sentiment import analyze_sentiment_with_llm
+from schemas.state import ResearchState, record_agent_timing
+from services.logger import logger, FLUSH
+from tools.macro_data import get_macro_data, get_macro_data_async
+from tools.sentiment import get_sentiment
+from services.llm_service import get_llm_semaphore
+
+# FAST_MODE=1 skips the sentiment LLM call for API (JSON_OUTPUT) runs
+FAST_MODE = os.getenv("FAST_MODE") == "1" and os.getenv("JSON_OUTPUT") == "true"
+
+DEFAULT_SENTIMENT = "Neutral"
+
+
+def _needs_sentiment(state: ResearchState, market_data: Dict[str, Any], ticker: str) -> bool:
+    """
+    Decide whether the sentiment LLM call is worth making.
+    
+    Without a known price trend the prompt carries no signal, so the
+    call is skipped and the neutral default used instead.
+    
+    Args:
+        state: Current research state
+        market_data: Market data snapshot
+        ticker: Stock ticker
+    
+    Returns:
+        True if sentiment should be requested from the LLM
+    """
+    if FAST_MODE or state.get("skip_sentiment") is True:
+        return False
+    return bool(ticker) and market_data.get("price_trend") not in ("Unknown", None)
 
 
 def macro_trends_agent(state: ResearchState) -> ResearchState:
@@ -22,7 +51,7 @@ def macro_trends_agent(state: ResearchState) -> ResearchState:
         Updated state with macro_data populated
     """
     agent_start = time.time()
-    print("\n[Macro Trends Agent] Analyzing macroeconomic conditions...")
+    logger.info("\n[Macro Trends Agent] Analyzing macroeconomic conditions...")
     
     # Get macro data
     macro_data = get_macro_data()
@@ -31,26 +60,78 @@ def macro_trends_agent(state: ResearchState) -> ResearchState:
     market_data = state.get("market_data", {})
     ticker = state.get("ticker", "")
     
-    # Analyze sentiment with LLM if we have context
+    # Analyze sentiment with LLM only if the context carries a signal
+    sentiment_time = 0
+    if _needs_sentiment(state, market_data, ticker):
+        sentiment_start = time.time()
+        context = f"Ticker: {ticker}, Price trend: {market_data.get('price_trend', 'Unknown')}"
+        sentiment = get_sentiment(ticker, context)
+        sentiment_time = time.time() - sentiment_start
+        macro_data["news_sentiment"] = sentiment
+        logger.info("[OK] Sentiment analysis complete in %.1fs. Result: %s", sentiment_time, sentiment)
+    else:
+        macro_data["news_sentiment"] = DEFAULT_SENTIMENT
+    
+    # Update state
+    state["macro_data"] = macro_data
+    
+    agent_time = time.time() - agent_start
+    logger.info("[Macro Trends Agent] Complete in %.1fs (LLM: %.1fs).", agent_time, sentiment_time, extra=FLUSH)
+    
+    # Store timing
+    record_agent_timing(state, macro_trends=agent_time)
+    if sentiment_time > 0:
+        record_agent_timing(state, macro_trends_llm=sentiment_time)
+    
+    return state
+
+
+async def macro_trends_agent_async(state: ResearchState) -> ResearchState:
+    """
+    Async Macro Trends Agent - same contract as macro_trends_agent.
+    
+    Only writes state["macro_data"], so it can share state with other
+    agents running on the same event loop.
+    
+    Args:
+        state: Current research state
+    
+    Returns:
+        Updated state with macro_data populated
+    """
+    agent_start = time.time()
+    logger.info("\n[Macro Trends Agent] Analyzing macroeconomic conditions...")
+    
+    # Snapshot market context before awaiting - a concurrent market data
+    # agent may fill it in mid-flight, which would make sentiment nondeterministic
+    market_data = state.get("market_data", {})
+    ticker = state.get("ticker", "")
+    
+    # Get macro data
+    macro_data = await get_macro_data_async()
+    
+    # Analyze sentiment with LLM only if the context carries a signal
     sentiment_time = 0
-    if market_data and ticker:
+    if _needs_sentiment(state, market_data, ticker):
         sentiment_start = time.time()
         context = f"Ticker: {ticker}, Price trend: {market_data.get('price_trend', 'Unknown')}"
-        sentiment = analyze_sentiment_with_llm(ticker, context)
+        async with get_llm_semaphore():
+            sentiment = await asyncio.to_thread(get_sentiment, ticker, context)
         sentiment_time = time.time() - sentiment_start
         macro_data["news_sentiment"] = sentiment
-        print(f"[OK] Sentiment analysis complete in {sentiment_time:.1f}s. Result: {sentiment}")
+        logger.info("[OK] Sentiment analysis complete in %.1fs. Result: %s", sentiment_time, sentiment)
+    else:
+        macro_data["news_sentiment"] = DEFAULT_SENTIMENT
     
     # Update state
     state["macro_data"] = macro_data
     
     agent_time = time.time() - agent_start
-    print(f"[Macro Trends Agent] Complete in {agent_time:.1f}s (LLM: {sentiment_time:.1f}s).")
+    logger.info("[Macro Trends Agent] Complete in %.1fs (LLM: %.1fs).", agent_time, sentiment_time, extra=FLUSH)
     
     # Store timing
-    state["_agent_timing"] = state.get("_agent_timing", {})
-    state["_agent_timing"]["macro_trends"] = agent_time
+    record_agent_timing(state, macro_trends=agent_time)
     if sentiment_time > 0:
-        state["_agent_timing"]["macro_trends_llm"] = sentiment_time
+        record_agent_timing(state, macro_trends_llm=sentiment_time)
     
     return state
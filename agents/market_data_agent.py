@@ -7,8 +7,9 @@ No opinions, no recommendations.
 
 import time
 from typing import Dict, Any
-from schemas.state import ResearchState
-from tools.market_data import get_market_data
+from schemas.state import ResearchState, record_agent_timing
+from services.logger import logger, FLUSH
+from tools.market_data import get_market_data, get_market_data_async
 
 
 def market_data_agent(state: ResearchState) -> ResearchState:
@@ -28,7 +29,7 @@ def market_data_agent(state: ResearchState) -> ResearchState:
         state["market_data"] = {"error": "No ticker provided"}
         return state
     
-    print(f"\n[Market Data Agent] Fetching data for {ticker}...")
+    logger.info("\n[Market Data Agent] Fetching data for %s...", ticker)
     
     # Fetch market data
     market_data = get_market_data(ticker)
@@ -37,10 +38,48 @@ def market_data_agent(state: ResearchState) -> ResearchState:
     state["market_data"] = market_data
     
     agent_time = time.time() - agent_start
-    print(f"[Market Data Agent] Complete in {agent_time:.1f}s. Price trend: {market_data.get('price_trend', 'Unknown')}")
+    logger.info("[Market Data Agent] Complete in %.1fs. Price trend: %s",
+                agent_time, market_data.get('price_trend', 'Unknown'), extra=FLUSH)
     
     # Store timing
-    state["_agent_timing"] = state.get("_agent_timing", {})
-    state["_agent_timing"]["market_data"] = agent_time
+    record_agent_timing(state, market_data=agent_time)
+    
+    return state
+
+
+async def market_data_agent_async(state: ResearchState) -> ResearchState:
+    """
+    Async Market Data Agent - same contract as market_data_agent.
+    
+    Only writes state["market_data"], so it can share state with other
+    agents running on the same event loop.
+    
+    Args:
+        state: Current research state
+    
+    Returns:
+        Updated state with market_data populated
+    """
+    agent_start = time.time()
+    ticker = state.get("ticker", "")
+    
+    if not ticker:
+        state["market_data"] = {"error": "No ticker provided"}
+        return state
+    
+    logger.info("\n[Market Data Agent] Fetching data for %s...", ticker)
+    
+    # Fetch market data
+    market_data = await get_market_data_async(ticker)
+    
+    # Update state
+    state["market_data"] = market_data
+    
+    agent_time = time.time() - agent_start
+    logger.info("[Market Data Agent] Complete in %.1fs. Price trend: %s",
+                agent_time, market_data.get('price_trend', 'Unknown'), extra=FLUSH)
+    
+    # Store timing
+    record_agent_timing(state, market_data=agent_time)
     
     return state
@@ -5,49 +5,181 @@ Responsibility: Generate professional investment memo in Markdown format.
 """
 
 import time
-from typing import Dict, Any
-from schemas.state import ResearchState
+import queue
+import threading
+import numpy as np
+from typing import Dict, Any, Optional, Tuple
+from schemas.state import ResearchState, record_agent_timing, build_prompt_context
+from services.logger import logger, FLUSH
+from services.llm_service import get_gemini_service, PromptPrefix
+from agents.scenario_agent import SCENARIO_KEYS
 import os
 
+# fsync the memo file once written (slower, survives power loss)
+DURABLE_WRITE = os.getenv("DURABLE_WRITE") == "1"
 
-def calculate_confidence_score(state: ResearchState) -> float:
+# Queue sentinel: the stream failed, discard the partial memo
+_ABORT = object()
+
+
+class MemoFileWriter:
     """
-    Calculate confidence score based on data completeness and quality.
+    Writes memo chunks to disk on a background thread.
+    
+    The agent only enqueues chunks, so disk I/O never blocks the LLM
+    stream. Chunks go to <path>.tmp, which replaces the memo file only
+    once the stream has finished, so a failed stream leaves the previous
+    memo in place. The thread is non-daemon: the interpreter waits for it
+    at exit, so the file is complete before the frontend reads it.
+    """
+    
+    def __init__(self, path: str):
+        """
+        Initialize writer and start its thread.
+        
+        Args:
+            path: Memo file path
+        """
+        self.path = path
+        self._queue: "queue.SimpleQueue[Any]" = queue.SimpleQueue()
+        self._thread = threading.Thread(target=self._run, name=f"memo-writer:{path}")
+        self._thread.start()
+    
+    def write(self, chunk: str) -> None:
+        """Queue a chunk for writing."""
+        self._queue.put(chunk)
+    
+    def close(self) -> None:
+        """Signal end of memo; the file is moved into place once queued chunks are written."""
+        self._queue.put(None)
+    
+    def abort(self) -> None:
+        """Signal a failed stream; the partial file is deleted."""
+        self._queue.put(_ABORT)
+    
+    def join(self, timeout: Optional[float] = None) -> None:
+        """Wait for the file to be fully written."""
+        self._thread.join(timeout)
+    
+    def _run(self) -> None:
+        tmp_path = self.path + ".tmp"
+        try:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                completed = self._write_stripped(f)
+                if completed and DURABLE_WRITE:
+                    os.fsync(f.fileno())
+            if completed:
+                os.replace(tmp_path, self.path)
+                return
+        except OSError as e:
+            logger.error("[Memo Writer Agent] Could not write %s: %s", self.path, e)
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+    
+    def _write_stripped(self, f) -> bool:
+        """
+        Write queued chunks until a sentinel, matching the stripped state["memo"].
+        
+        Leading whitespace is dropped and trailing whitespace is held back
+        until more text follows it, so the file ends up equal to the
+        joined chunks after .strip().
+        
+        Returns:
+            True on close(), False on abort()
+        """
+        started = False
+        pending = ""
+        while True:
+            chunk = self._queue.get()
+            if chunk is None:
+                return True
+            if chunk is _ABORT:
+                return False
+            if not started:
+                chunk = chunk.lstrip()
+                if not chunk:
+                    continue
+                started = True
+            text = pending + chunk
+            body = text.rstrip()
+            pending = text[len(body):]
+            if body:
+                f.write(body)
+                f.flush()
+
+
+def _summarize(state: ResearchState) -> Tuple[float, str]:
+    """
+    Compute confidence score and recommendation in one pass over state.
     
     Args:
         state: Current research state
     
     Returns:
-        Confidence score between 0 and 1
+        (confidence score between 0 and 1, "Buy" | "Hold" | "Sell")
     """
+    md = state.get("market_data") or {}
+    mc = state.get("macro_data") or {}
+    ra = state.get("risk_analysis") or {}
+    sc = state.get("scenarios") or {}
+    
+    volatility = ra.get("volatility")
+    if volatility is None:
+        volatility = 0.3
+    
     # Data completeness (0.3 weight)
     completeness = 1.0
-    if not state.get("market_data") or state.get("market_data", {}).get("error"):
+    if not md or md.get("error"):
         completeness -= 0.3
-    if not state.get("macro_data") or state.get("macro_data", {}).get("error"):
+    if not mc or mc.get("error"):
         completeness -= 0.2
-    if not state.get("risk_analysis") or state.get("risk_analysis", {}).get("error"):
+    if not ra or ra.get("error"):
         completeness -= 0.2
-    if not state.get("scenarios"):
+    if not sc:
         completeness -= 0.3
-    
     completeness = max(0.0, completeness)
     
-    # Volatility penalty (0.3 weight)
-    volatility = state.get("risk_analysis", {}).get("volatility", 0.3)
-    volatility_score = max(0.0, 1.0 - volatility)  # Lower volatility = higher score
+    # Volatility penalty (0.3 weight) - lower volatility = higher score
+    volatility_score = max(0.0, 1.0 - volatility)
     
     # Agent agreement (0.4 weight) - simplified for now
     agreement = 0.7  # Placeholder - can be enhanced with actual agreement metrics
     
-    # Calculate final confidence
-    confidence = (
-        completeness * 0.3 +
-        agreement * 0.4 +
-        volatility_score * 0.3
-    )
+    confidence = completeness * 0.3 + agreement * 0.4 + volatility_score * 0.3
+    confidence = round(max(0.0, min(1.0, confidence)), 2)
+    
+    if not sc:
+        return confidence, "Hold"
+    
+    # Expected return over whichever scenarios are present
+    present = [sc[k] for k in SCENARIO_KEYS if k in sc]
+    returns = np.array([s.get("return", 0) for s in present], dtype=np.float64)
+    probs = np.array([s.get("prob", 0) for s in present], dtype=np.float64)
+    expected_return = float(np.dot(returns, probs))
+    
+    if expected_return > 0.10 and volatility < 0.4:
+        recommendation = "Buy"
+    elif expected_return < -0.05 or volatility > 0.5:
+        recommendation = "Sell"
+    else:
+        recommendation = "Hold"
+    
+    return confidence, recommendation
+
+
+def calculate_confidence_score(state: ResearchState) -> float:
+    """
+    Calculate confidence score based on data completeness and quality.
     
-    return round(max(0.0, min(1.0, confidence)), 2)
+    Args:
+        state: Current research state
+    
+    Returns:
+        Confidence score between 0 and 1
+    """
+    return _summarize(state)[0]
 
 
 def determine_recommendation(state: ResearchState) -> str:
@@ -60,29 +192,25 @@ def determine_recommendation(state: ResearchState) -> str:
     Returns:
         Recommendation: "Buy", "Hold", or "Sell"
     """
-    scenarios = state.get("scenarios", {})
-    
-    if not scenarios:
-        return "Hold"
-    
-    # Calculate expected return
-    expected_return = (
-        scenarios.get("bull", {}).get("return", 0) * scenarios.get("bull", {}).get("prob", 0) +
-        scenarios.get("base", {}).get("return", 0) * scenarios.get("base", {}).get("prob", 0) +
-        scenarios.get("bear", {}).get("return", 0) * scenarios.get("bear", {}).get("prob", 0)
-    )
-    
-    # Get risk metrics
-    risk_analysis = state.get("risk_analysis", {})
-    volatility = risk_analysis.get("volatility", 0.3)
-    
-    # Determine recommendation
-    if expected_return > 0.10 and volatility < 0.4:
-        return "Buy"
-    elif expected_return < -0.05 or volatility > 0.5:
-        return "Sell"
-    else:
-        return "Hold"
+    return _summarize(state)[1]
+
+
+# Static format instructions - identical across tickers, so sent first
+MEMO_PREFIX = PromptPrefix("memo", """You are a sell-side equity analyst writing an investment memo
+for the stock described below.
+
+Format: Markdown with sections:
+1. Executive Summary
+2. Thesis
+3. Supporting Data
+4. Risks
+5. Scenarios
+6. Recommendation
+7. Disclaimer
+
+Tone: Professional, no hype language
+
+""")
 
 
 def memo_writer_agent(state: ResearchState) -> ResearchState:
@@ -96,80 +224,72 @@ def memo_writer_agent(state: ResearchState) -> ResearchState:
         Updated state with memo and recommendation populated
     """
     ticker = state.get("ticker", "")
-    horizon = state.get("horizon", "medium")
-    risk_profile = state.get("risk_profile", "moderate")
     
     agent_start = time.time()
-    print(f"\n[Memo Writer Agent] Generating investment memo...")
+    logger.info("\n[Memo Writer Agent] Generating investment memo...")
     
     # Calculate confidence and recommendation
-    confidence = calculate_confidence_score(state)
-    recommendation = determine_recommendation(state)
+    confidence, recommendation = _summarize(state)
     
     state["confidence_score"] = confidence
     state["recommendation"] = recommendation
     
-    print(f"[Memo Writer Agent] Recommendation: {recommendation}, Confidence: {confidence}")
+    logger.info("[Memo Writer Agent] Recommendation: %s, Confidence: %s", recommendation, confidence)
     
     # Generate memo
     try:
-        from services.llm_service import get_gemini_service
-        
         gemini = get_gemini_service()
-        print("[Memo Writer Agent] Calling Gemini API...")
+        logger.info("[Memo Writer Agent] Calling Gemini API...")
         
         llm_start = time.time()
-        market_data = state.get("market_data", {})
-        macro_data = state.get("macro_data", {})
+        # The memo prompt has always used "N/A" for missing data
+        ctx = build_prompt_context(state, missing="N/A")
         risk_analysis = state.get("risk_analysis", {})
         scenarios = state.get("scenarios", {})
         
-        # Structured markdown format prompt
-        prompt = f"""Write investment memo for {ticker} ({horizon} term, {risk_profile} risk):
+        # Dynamic tail only - format instructions live in MEMO_PREFIX
+        prompt = f"""Write investment memo for {ctx.ticker} ({ctx.horizon} term, {ctx.risk_profile} risk):
 
 Key Data:
 - Recommendation: {recommendation} (Confidence: {confidence:.0%})
-- Price Trend: {market_data.get('price_trend', 'N/A')}, P/E: {market_data.get('valuation', {}).get('pe_ratio', 'N/A')}
-- Macro: {macro_data.get('interest_rate_trend', 'N/A')} rates, {macro_data.get('market_trend', 'N/A')} market
+- Price Trend: {ctx.price_trend}, P/E: {ctx.pe_ratio}
+- Macro: {ctx.interest_rate_trend} rates, {ctx.market_trend} market
 - Risk: Vol {risk_analysis.get('volatility', 'N/A')}, Beta {risk_analysis.get('beta', 'N/A')}
-- Scenarios: Bull {scenarios.get('bull', {}).get('return', 0)*100:+.0f}% ({scenarios.get('bull', {}).get('prob', 0)*100:.0f}%), Base {scenarios.get('base', {}).get('return', 0)*100:+.0f}% ({scenarios.get('base', {}).get('prob', 0)*100:.0f}%), Bear {scenarios.get('bear', {}).get('return', 0)*100:+.0f}% ({scenarios.get('bear', {}).get('prob', 0)*100:.0f}%)
-
-Format: Markdown with sections:
-1. Executive Summary
-2. Thesis
-3. Supporting Data
-4. Risks
-5. Scenarios
-6. Recommendation
-7. Disclaimer
-
-Tone: Professional, no hype language"""
+- Scenarios: Bull {scenarios.get('bull', {}).get('return', 0)*100:+.0f}% ({scenarios.get('bull', {}).get('prob', 0)*100:.0f}%), Base {scenarios.get('base', {}).get('return', 0)*100:+.0f}% ({scenarios.get('base', {}).get('prob', 0)*100:.0f}%), Bear {scenarios.get('bear', {}).get('return', 0)*100:+.0f}% ({scenarios.get('bear', {}).get('prob', 0)*100:.0f}%)"""
 
-        memo = gemini.invoke(prompt, temperature=0.3)
-        llm_time = time.time() - llm_start
-        print(f"[OK] Memo generation complete in {llm_time:.1f}s")
-        
-        state["memo"] = memo
-        
-        # Save memo to file
+        # Stream the memo to disk as tokens arrive; writes happen on a
+        # background thread so they stay off the agent's critical path
         outputs_dir = "outputs"
         os.makedirs(outputs_dir, exist_ok=True)
         memo_file = os.path.join(outputs_dir, f"{ticker}_memo.md")
         
-        with open(memo_file, "w", encoding="utf-8") as f:
-            f.write(memo)
+        buf = []
+        writer = MemoFileWriter(memo_file)
+        try:
+            for chunk in gemini.stream(prompt, temperature=0.3, prefix=MEMO_PREFIX):
+                writer.write(chunk)
+                buf.append(chunk)
+        except BaseException:
+            # Keep the previous memo on disk; drop the partial one
+            writer.abort()
+            raise
+        writer.close()
+        
+        memo = "".join(buf).strip()
+        llm_time = time.time() - llm_start
+        logger.info("[OK] Memo generation complete in %.1fs", llm_time)
+        
+        state["memo"] = memo
         
         agent_time = time.time() - agent_start
-        print(f"Memo saved to {memo_file} (took {agent_time:.1f}s, LLM: {llm_time:.1f}s)")
+        logger.info("Memo saved to %s (took %.1fs, LLM: %.1fs)", memo_file, agent_time, llm_time, extra=FLUSH)
         
         # Store timing
-        state["_agent_timing"] = state.get("_agent_timing", {})
-        state["_agent_timing"]["memo_writer"] = agent_time
-        state["_agent_timing"]["memo_writer_llm"] = llm_time
+        record_agent_timing(state, memo_writer=agent_time, memo_writer_llm=llm_time)
         
     except Exception as e:
         agent_time = time.time() - agent_start
-        print(f"Error generating memo after {agent_time:.1f}s: {e}")
+        logger.error("Error generating memo after %.1fs: %s", agent_time, e)
         state["memo"] = f"Error generating memo: {str(e)}"
     
     return state
@@ -5,9 +5,36 @@ Responsibility: Compute risk metrics and identify key risks.
 """
 
 import time
+import asyncio
 from typing import Dict, Any, List
-from schemas.state import ResearchState
+from schemas.state import ResearchState, record_agent_timing
+from schemas.context import PromptContext
+from services.logger import logger, FLUSH
 from tools.risk_metrics import get_risk_metrics
+from services.llm_service import get_gemini_service, get_llm_semaphore, PromptPrefix, CircuitOpen, JSON_MAX_OUTPUT_TOKENS
+
+
+# Gemini JSON-mode response schema (only key_risks is consumed downstream)
+RISK_SCHEMA = {
+    "type": "OBJECT",
+    "properties": {
+        "volatility": {"type": "NUMBER"},
+        "beta": {"type": "NUMBER"},
+        "drawdown": {"type": "STRING", "enum": ["Low", "Medium", "High"]},
+        "key_risks": {"type": "ARRAY", "items": {"type": "STRING"}}
+    },
+    "required": ["key_risks"]
+}
+
+# Static instructions - identical across tickers, so sent first
+RISK_PREFIX = PromptPrefix("risk", """You are a risk analyst. Analyze the risk of the stock described below
+using its market data, macro environment and risk metrics.
+
+Constraints:
+- volatility between 0.0 and 1.0, beta > 0
+- key_risks: 2-5 concise risks
+
+""")
 
 
 def identify_key_risks(ticker: str, market_data: Dict[str, Any], 
@@ -27,37 +54,29 @@ def identify_key_risks(ticker: str, market_data: Dict[str, Any],
         List of key risks
     """
     try:
-        from services.llm_service import get_gemini_service
-        
         gemini = get_gemini_service()
         
-        # Explicit schema with constraints
-        prompt = f"""Analyze risk for {ticker}:
+        ctx = PromptContext.from_data(ticker, market_data, macro_data)
+        
+        # Dynamic tail only - instructions live in RISK_PREFIX, schema in RISK_SCHEMA
+        prompt = f"""Analyze risk for {ctx.ticker}:
 Market Data:
-- Price Trend: {market_data.get('price_trend', 'Unknown')}
-- P/E Ratio: {market_data.get('valuation', {}).get('pe_ratio', 'Unknown')}
-- RSI: {market_data.get('technical_indicators', {}).get('rsi', 'Unknown')}
+- Price Trend: {ctx.price_trend}
+- P/E Ratio: {ctx.pe_ratio}
+- RSI: {ctx.rsi}
 
 Macro Environment:
-- Interest Rate Trend: {macro_data.get('interest_rate_trend', 'Unknown')}
-- Inflation Trend: {macro_data.get('inflation_trend', 'Unknown')}
-- Market Trend: {macro_data.get('market_trend', 'Unknown')}
+- Interest Rate Trend: {ctx.interest_rate_trend}
+- Inflation Trend: {ctx.inflation_trend}
+- Market Trend: {ctx.market_trend}
 
 Risk Metrics:
 - Volatility: {risk_metrics.get('volatility', 'Unknown')}
 - Beta: {risk_metrics.get('beta', 'Unknown')}
-- Drawdown: {risk_metrics.get('drawdown', 'Unknown')}
-
-Return JSON schema:
-{{
-  "volatility": float (0.0-1.0),
-  "beta": float (>0),
-  "drawdown": "Low|Medium|High",
-  "key_risks": [string, 2-5 items],
-  "reasoning": string
-}}"""
-
-        result = gemini.invoke_json(prompt, temperature=0.5)
+- Drawdown: {risk_metrics.get('drawdown', 'Unknown')}"""
+
+        result = gemini.invoke_json(prompt, temperature=0.1, max_tokens=JSON_MAX_OUTPUT_TOKENS,
+                                    schema=RISK_SCHEMA, prefix=RISK_PREFIX)
         
         # Extract key risks
         key_risks = result.get("key_risks", [])
@@ -65,11 +84,35 @@ Return JSON schema:
             return ["Unable to identify risks"]
         
         return key_risks[:5]  # Limit to 5 risks
+    except CircuitOpen as e:
+        logger.warning("[Risk Analyst Agent] %s - using fallback risks", e)
+        return ["Unable to identify risks"]
     except Exception as e:
-        print(f"Error identifying risks: {e}")
+        logger.error("Error identifying risks: %s", e)
         return ["Unable to identify risks"]
 
 
+async def identify_key_risks_async(ticker: str, market_data: Dict[str, Any],
+                                   macro_data: Dict[str, Any],
+                                   risk_metrics: Dict[str, Any]) -> List[str]:
+    """
+    Async variant of identify_key_risks.
+    
+    Runs the Gemini call on a worker thread, gated by the shared LLM semaphore.
+    
+    Args:
+        ticker: Stock ticker
+        market_data: Market data dictionary
+        macro_data: Macro data dictionary
+        risk_metrics: Risk metrics dictionary
+    
+    Returns:
+        List of key risks
+    """
+    async with get_llm_semaphore():
+        return await asyncio.to_thread(identify_key_risks, ticker, market_data, macro_data, risk_metrics)
+
+
 def risk_agent(state: ResearchState) -> ResearchState:
     """
     Risk Analyst Agent - Computes risk metrics and identifies risks.
@@ -87,7 +130,7 @@ def risk_agent(state: ResearchState) -> ResearchState:
         state["risk_analysis"] = {"error": "No ticker provided"}
         return state
     
-    print(f"\n[Risk Analyst Agent] Computing risk metrics for {ticker}...")
+    logger.info("\n[Risk Analyst Agent] Computing risk metrics for %s...", ticker)
     
     # Get risk metrics
     risk_metrics = get_risk_metrics(ticker)
@@ -97,11 +140,11 @@ def risk_agent(state: ResearchState) -> ResearchState:
     macro_data = state.get("macro_data", {})
     
     # Identify key risks using LLM
-    print("[Risk Analyst Agent] Calling Gemini API...")
+    logger.info("[Risk Analyst Agent] Calling Gemini API...")
     llm_start = time.time()
     key_risks = identify_key_risks(ticker, market_data, macro_data, risk_metrics)
     llm_time = time.time() - llm_start
-    print(f"[OK] Risk analysis complete in {llm_time:.1f}s")
+    logger.info("[OK] Risk analysis complete in %.1fs", llm_time)
     
     # Combine into risk analysis
     risk_analysis = {
@@ -113,11 +156,10 @@ def risk_agent(state: ResearchState) -> ResearchState:
     state["risk_analysis"] = risk_analysis
     
     agent_time = time.time() - agent_start
-    print(f"[Risk Analyst Agent] Complete in {agent_time:.1f}s (LLM: {llm_time:.1f}s). Volatility: {risk_metrics.get('volatility', 'Unknown')}")
+    logger.info("[Risk Analyst Agent] Complete in %.1fs (LLM: %.1fs). Volatility: %s",
+                agent_time, llm_time, risk_metrics.get('volatility', 'Unknown'), extra=FLUSH)
     
     # Store timing
-    state["_agent_timing"] = state.get("_agent_timing", {})
-    state["_agent_timing"]["risk_analysis"] = agent_time
-    state["_agent_timing"]["risk_analysis_llm"] = llm_time
+    record_agent_timing(state, risk_analysis=agent_time, risk_analysis_llm=llm_time)
     
     return state
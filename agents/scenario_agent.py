@@ -5,104 +5,158 @@ Responsibility: Generate Bull/Base/Bear scenarios with probabilities.
 """
 
 import time
-from typing import Dict, Any
-from schemas.state import ResearchState
+import asyncio
+import numpy as np
+from typing import Dict, Any, Optional
+from schemas.state import ResearchState, record_agent_timing, build_prompt_context
+from services.logger import logger, FLUSH
+from services.llm_service import get_gemini_service, get_llm_semaphore, PromptPrefix, CircuitOpen, JSON_MAX_OUTPUT_TOKENS
 import json
 
 
-def scenario_agent(state: ResearchState) -> ResearchState:
+SCENARIO_KEYS = ("bull", "base", "bear")
+
+_SCENARIO_CASE = {
+    "type": "OBJECT",
+    "properties": {"return": {"type": "NUMBER"}, "prob": {"type": "NUMBER"}},
+    "required": ["return", "prob"]
+}
+
+# Gemini JSON-mode response schema
+SCENARIO_SCHEMA = {
+    "type": "OBJECT",
+    "properties": {k: _SCENARIO_CASE for k in SCENARIO_KEYS},
+    "required": list(SCENARIO_KEYS)
+}
+
+# Static instructions - identical across tickers, so sent first
+SCENARIO_PREFIX = PromptPrefix("scenario", """You are an equity strategist. Generate Bull/Base/Bear scenarios for
+the stock described below using its market, macro and risk context.
+
+Constraints:
+- prob values must sum to 1.0
+- return values as decimals (e.g., 0.25 for 25%)
+
+""")
+
+
+def default_scenarios() -> Dict[str, Any]:
+    """Fallback scenarios used when the LLM output is missing or invalid."""
+    return {
+        "bull": {"return": 0.20, "prob": 0.30},
+        "base": {"return": 0.05, "prob": 0.50},
+        "bear": {"return": -0.15, "prob": 0.20}
+    }
+
+
+def normalize_scenarios(scenarios: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Validate scenario probabilities and normalize them to sum to 1.0.
+    
+    Args:
+        scenarios: Raw bull/base/bear scenarios from the LLM
+    
+    Returns:
+        Normalized scenarios (defaults if probabilities are invalid)
+    """
+    present = [k for k in SCENARIO_KEYS if k in scenarios]
+    probs = np.fromiter((scenarios[k].get("prob", 0) for k in present),
+                        dtype=np.float64, count=len(present))
+    total_prob = probs.sum()
+    
+    if total_prob > 0:
+        # Normalize probabilities
+        probs /= total_prob
+        for k, p in zip(present, probs):
+            scenarios[k]["prob"] = float(p)
+        return scenarios
+    
+    # Default probabilities if invalid
+    return default_scenarios()
+
+
+def scenario_agent(state: ResearchState, risk_metrics: Optional[Dict[str, Any]] = None) -> ResearchState:
     """
     Scenario Analysis Agent - Generates Bull/Base/Bear scenarios.
     
+    Only the numeric risk metrics (volatility, beta) feed the prompt, so
+    this agent does not have to wait for the key-risks LLM call.
+    
     Args:
         state: Current research state
+        risk_metrics: Numeric risk metrics (defaults to state["risk_analysis"])
     
     Returns:
         Updated state with scenarios populated
     """
-    ticker = state.get("ticker", "")
-    horizon = state.get("horizon", "medium")
-    market_data = state.get("market_data", {})
-    macro_data = state.get("macro_data", {})
-    risk_analysis = state.get("risk_analysis", {})
+    ctx = build_prompt_context(state)
+    if risk_metrics is None:
+        risk_metrics = state.get("risk_analysis", {})
     
     agent_start = time.time()
-    print(f"\n[Scenario Agent] Calling Gemini API...")
+    logger.info("\n[Scenario Agent] Calling Gemini API...")
     
     try:
-        from services.llm_service import get_gemini_service
-        
         gemini = get_gemini_service()
         llm_start = time.time()
         
-        # Explicit schema with probability constraints
-        prompt = f"""Generate scenarios for {ticker} ({horizon}-term horizon):
+        # Dynamic tail only - constraints live in SCENARIO_PREFIX, schema in SCENARIO_SCHEMA
+        prompt = f"""Generate scenarios for {ctx.ticker} ({ctx.horizon}-term horizon):
 
 Market Context:
-- Price Trend: {market_data.get('price_trend', 'Unknown')}
-- P/E Ratio: {market_data.get('valuation', {}).get('pe_ratio', 'Unknown')}
-- RSI: {market_data.get('technical_indicators', {}).get('rsi', 'Unknown')}
+- Price Trend: {ctx.price_trend}
+- P/E Ratio: {ctx.pe_ratio}
+- RSI: {ctx.rsi}
 
 Macro Context:
-- Interest Rate Trend: {macro_data.get('interest_rate_trend', 'Unknown')}
-- Inflation Trend: {macro_data.get('inflation_trend', 'Unknown')}
-- Market Trend: {macro_data.get('market_trend', 'Unknown')}
+- Interest Rate Trend: {ctx.interest_rate_trend}
+- Inflation Trend: {ctx.inflation_trend}
+- Market Trend: {ctx.market_trend}
 
 Risk Context:
-- Volatility: {risk_analysis.get('volatility', 'Unknown')}
-- Beta: {risk_analysis.get('beta', 'Unknown')}
-- Key Risks: {', '.join(risk_analysis.get('key_risks', []))}
-
-Return JSON schema:
-{{
-  "bull": {{"return": float, "prob": float}},
-  "base": {{"return": float, "prob": float}},
-  "bear": {{"return": float, "prob": float}}
-}}
-
-Constraints:
-- prob values must sum to 1.0
-- return values as decimals (e.g., 0.25 for 25%)"""
+- Volatility: {risk_metrics.get('volatility', 'Unknown')}
+- Beta: {risk_metrics.get('beta', 'Unknown')}"""
 
-        scenarios = gemini.invoke_json(prompt, temperature=0.7)
+        scenarios = gemini.invoke_json(prompt, temperature=0.1, max_tokens=JSON_MAX_OUTPUT_TOKENS,
+                                       schema=SCENARIO_SCHEMA, prefix=SCENARIO_PREFIX)
         llm_time = time.time() - llm_start
-        print(f"[OK] Scenario generation complete in {llm_time:.1f}s")
+        logger.info("[OK] Scenario generation complete in %.1fs", llm_time)
         
         # Validate and normalize probabilities
-        total_prob = scenarios.get("bull", {}).get("prob", 0) + \
-                    scenarios.get("base", {}).get("prob", 0) + \
-                    scenarios.get("bear", {}).get("prob", 0)
-        
-        if total_prob > 0:
-            # Normalize probabilities
-            for scenario in ["bull", "base", "bear"]:
-                if scenario in scenarios:
-                    scenarios[scenario]["prob"] = scenarios[scenario]["prob"] / total_prob
-        else:
-            # Default probabilities if invalid
-            scenarios = {
-                "bull": {"return": 0.20, "prob": 0.30},
-                "base": {"return": 0.05, "prob": 0.50},
-                "bear": {"return": -0.15, "prob": 0.20}
-            }
+        scenarios = normalize_scenarios(scenarios)
         
         state["scenarios"] = scenarios
         agent_time = time.time() - agent_start
-        print(f"[Scenario Agent] Complete in {agent_time:.1f}s (LLM: {llm_time:.1f}s).")
+        logger.info("[Scenario Agent] Complete in %.1fs (LLM: %.1fs).", agent_time, llm_time, extra=FLUSH)
         
         # Store timing
-        state["_agent_timing"] = state.get("_agent_timing", {})
-        state["_agent_timing"]["scenario_analysis"] = agent_time
-        state["_agent_timing"]["scenario_analysis_llm"] = llm_time
+        record_agent_timing(state, scenario_analysis=agent_time, scenario_analysis_llm=llm_time)
         
+    except CircuitOpen as e:
+        logger.warning("[Scenario Agent] %s - using default scenarios", e)
+        state["scenarios"] = default_scenarios()
     except Exception as e:
         agent_time = time.time() - agent_start
-        print(f"Error generating scenarios after {agent_time:.1f}s: {e}")
+        logger.error("Error generating scenarios after %.1fs: %s", agent_time, e)
         # Default scenarios on error
-        state["scenarios"] = {
-            "bull": {"return": 0.20, "prob": 0.30},
-            "base": {"return": 0.05, "prob": 0.50},
-            "bear": {"return": -0.15, "prob": 0.20}
-        }
+        state["scenarios"] = default_scenarios()
     
     return state
+
+
+async def scenario_agent_async(state: ResearchState, risk_metrics: Dict[str, Any]) -> ResearchState:
+    """
+    Async Scenario Analysis Agent - same contract as scenario_agent.
+    
+    Runs on a worker thread, gated by the shared LLM semaphore. Only
+    writes state["scenarios"], so it can run alongside the key-risks call.
+    
+    Args:
+        state: Current research state
+        risk_metrics: Numeric risk metrics (volatility, beta)
+    
+    Returns:
+        Updated state with scenarios populated
+    """
+    async with get_llm_semaphore():
+        return await asyncio.to_thread(scenario_agent, state, risk_metrics)
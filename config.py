@@ -18,6 +18,9 @@ HUGGINGFACE_API_KEY = os.getenv("HUGGINGFACE_API_KEY")
 # FRED API configuration
 FRED_API_KEY = os.getenv("FRED_API_KEY")
 
+# Max tickers analyzed concurrently in batch mode (main.py --batch / --tickers)
+BATCH_CONCURRENCY = int(os.getenv("BATCH_CONCURRENCY", "8"))
+
 
 def get_llm(temperature: float = 0.7, timeout: int = 120, agent_name: str = "default") -> LLMWrapper:
     """
@@ -0,0 +1,106 @@
+"""
+Async Pipeline
+
+Runs the research workflow as a plain coroutine, awaiting the agents
+directly in dependency order:
+Start → (MarketDataAgent ∥ MacroTrendsAgent) → RiskScenarioAgent
+→ MemoWriterAgent → End
+
+RiskScenarioAgent makes one combined Gemini request; set
+COMBINE_RISK_SCENARIO=0 to issue the key-risks and scenario calls
+as two concurrent requests instead.
+"""
+
+import os
+import time
+import asyncio
+from schemas.state import ResearchState, record_agent_timing
+from services.logger import logger, FLUSH
+from services.llm_service import get_llm_semaphore
+from agents.market_data_agent import market_data_agent_async
+from agents.macro_trends_agent import macro_trends_agent_async
+from agents.risk_agent import identify_key_risks_async
+from agents.scenario_agent import scenario_agent_async
+from agents.combined_risk_scenario_agent import combined_risk_scenario_agent
+from agents.memo_writer_agent import memo_writer_agent
+from tools.risk_metrics import get_risk_metrics
+
+# One Gemini round-trip for key risks + scenarios (vs two concurrent calls)
+COMBINE_RISK_SCENARIO = os.getenv("COMBINE_RISK_SCENARIO", "1") != "0"
+
+
+async def collect_data(state: ResearchState) -> None:
+    """Run both data collection agents concurrently on one event loop."""
+    await asyncio.gather(
+        market_data_agent_async(state),
+        macro_trends_agent_async(state),
+    )
+
+
+async def fan_out_risk_scenario(state: ResearchState) -> None:
+    """Compute risk metrics, then fan out the key-risks and scenario LLM calls."""
+    agent_start = time.time()
+    ticker = state.get("ticker", "")
+    market_data = state.get("market_data", {})
+    macro_data = state.get("macro_data", {})
+
+    if not ticker:
+        state["risk_analysis"] = {"error": "No ticker provided"}
+        await scenario_agent_async(state, {})
+        return
+
+    logger.info("\n[Risk Analyst Agent] Computing risk metrics for %s...", ticker)
+    risk_metrics = await asyncio.to_thread(get_risk_metrics, ticker)
+
+    # Both LLM calls only need the numeric metrics - run them concurrently
+    logger.info("[Risk Analyst Agent] Calling Gemini API...")
+    llm_start = time.time()
+    key_risks, _ = await asyncio.gather(
+        identify_key_risks_async(ticker, market_data, macro_data, risk_metrics),
+        scenario_agent_async(state, risk_metrics),
+    )
+    llm_time = time.time() - llm_start
+
+    # Join: merge the narrative risks into the numeric metrics
+    state["risk_analysis"] = {
+        **risk_metrics,
+        "key_risks": key_risks
+    }
+
+    agent_time = time.time() - agent_start
+    logger.info("[Risk Analyst Agent] Complete in %.1fs (LLM: %.1fs). Volatility: %s",
+                agent_time, llm_time, risk_metrics.get('volatility', 'Unknown'), extra=FLUSH)
+
+    # Store timing
+    record_agent_timing(state, risk_analysis=agent_time, risk_analysis_llm=llm_time)
+
+
+async def analyze_risk_scenario(state: ResearchState) -> None:
+    """Produce risk_analysis and scenarios (combined or fanned-out requests)."""
+    if COMBINE_RISK_SCENARIO:
+        # Counts against GEMINI_CONCURRENCY like the fanned-out calls
+        async with get_llm_semaphore():
+            await asyncio.to_thread(combined_risk_scenario_agent, state)
+    else:
+        await fan_out_risk_scenario(state)
+
+
+async def run_pipeline(state: ResearchState) -> ResearchState:
+    """
+    Run the full research workflow without a graph framework.
+
+    Blocking agents run on worker threads so several pipelines can
+    share one event loop.
+
+    Args:
+        state: Initial research state
+
+    Returns:
+        Final state with all analysis results
+    """
+    await collect_data(state)
+    await analyze_risk_scenario(state)
+    async with get_llm_semaphore():
+        await asyncio.to_thread(memo_writer_agent, state)
+
+    return state
@@ -2,46 +2,57 @@
 LangGraph Orchestration
 
 Defines the research workflow graph:
-Start → MarketDataAgent → MacroTrendsAgent → RiskAgent 
-→ ScenarioAgent → MemoWriterAgent → End
+Start → (MarketDataAgent ∥ MacroTrendsAgent) → RiskScenarioAgent
+→ MemoWriterAgent → End
+
+By default run_research_analysis awaits the same steps directly via
+graph.pipeline.run_pipeline; set USE_LANGGRAPH=1 to run the compiled
+StateGraph instead.
 """
 
 from typing import Dict, Any
+import os
 import time
-from langgraph.graph import StateGraph, END
 from schemas.state import ResearchState
-from agents.market_data_agent import market_data_agent
-from agents.macro_trends_agent import macro_trends_agent
-from agents.risk_agent import risk_agent
-from agents.scenario_agent import scenario_agent
+from services.llm_service import run_async
+from graph.pipeline import (
+    COMBINE_RISK_SCENARIO,
+    collect_data,
+    fan_out_risk_scenario,
+    run_pipeline,
+)
+from agents.combined_risk_scenario_agent import combined_risk_scenario_agent
 from agents.memo_writer_agent import memo_writer_agent
 
+# LangGraph execution is kept for compatibility; the default path awaits
+# the agents directly via graph.pipeline.run_pipeline
+USE_LANGGRAPH = os.getenv("USE_LANGGRAPH", "0") == "1"
+
+
 # For parallel execution - run both data collection agents simultaneously
 def run_parallel_data_collection(state: ResearchState) -> ResearchState:
     """
     Run Market Data and Macro Trends agents in parallel.
     These are independent and can run simultaneously to save time.
+    
+    Both agents are I/O-bound and write disjoint keys (market_data vs
+    macro_data), so they share the state object directly - no copies.
+    """
+    run_async(collect_data(state))
+    
+    return state
+
+
+def run_parallel_risk_scenario(state: ResearchState) -> ResearchState:
+    """
+    Run the key-risks and scenario LLM calls in parallel.
+    
+    Scenarios depend only on the numeric risk metrics, not on the
+    narrative key risks, so both calls fan out after get_risk_metrics
+    and join before the memo writer.
     """
-    import concurrent.futures
-    import copy
-    
-    # Create copies of state for each agent to avoid conflicts
-    market_state = copy.deepcopy(state)
-    macro_state = copy.deepcopy(state)
-    
-    # Run both agents in parallel
-    with concurrent.futures.ThreadPoolExecutor(max_workers=2) as executor:
-        market_future = executor.submit(market_data_agent, market_state)
-        macro_future = executor.submit(macro_trends_agent, macro_state)
-        
-        # Wait for both to complete
-        market_result = market_future.result()
-        macro_result = macro_future.result()
-        
-        # Merge results back into original state
-        state["market_data"] = market_result.get("market_data", {})
-        state["macro_data"] = macro_result.get("macro_data", {})
-        
+    run_async(fan_out_risk_scenario(state))
+    
     return state
 
 # Global timing tracker
@@ -55,23 +66,28 @@ def create_research_graph() -> Any:
     Returns:
         Configured StateGraph instance
     """
+    from langgraph.graph import StateGraph, END
+    
     # Create the graph
     workflow = StateGraph(ResearchState)
     
     # Add nodes (agents)
     # OPTIMIZATION: Run market_data and macro_trends in parallel since they're independent
     workflow.add_node("data_collection", run_parallel_data_collection)
-    workflow.add_node("risk_analysis", risk_agent)
-    workflow.add_node("scenario_analysis", scenario_agent)
+    # OPTIMIZATION: Key risks and scenarios come from one combined request,
+    # or fan out concurrently once risk metrics are known
+    if COMBINE_RISK_SCENARIO:
+        workflow.add_node("risk_scenario", combined_risk_scenario_agent)
+    else:
+        workflow.add_node("risk_scenario", run_parallel_risk_scenario)
     workflow.add_node("memo_writer", memo_writer_agent)
     
     # Define the flow
     workflow.set_entry_point("data_collection")
     
     # After parallel data collection, continue with dependent agents
-    workflow.add_edge("data_collection", "risk_analysis")
-    workflow.add_edge("risk_analysis", "scenario_analysis")
-    workflow.add_edge("scenario_analysis", "memo_writer")
+    workflow.add_edge("data_collection", "risk_scenario")
+    workflow.add_edge("risk_scenario", "memo_writer")
     workflow.add_edge("memo_writer", END)
     
     # Compile the graph
@@ -80,9 +96,9 @@ def create_research_graph() -> Any:
     return app
 
 
-def run_research_analysis(ticker: str, horizon: str, risk_profile: str) -> Dict[str, Any]:
+def create_initial_state(ticker: str, horizon: str, risk_profile: str) -> ResearchState:
     """
-    Run the complete research analysis pipeline.
+    Build the initial research state for one ticker.
     
     Args:
         ticker: Stock ticker symbol
@@ -90,13 +106,9 @@ def run_research_analysis(ticker: str, horizon: str, risk_profile: str) -> Dict[
         risk_profile: Risk profile (conservative/moderate/aggressive)
     
     Returns:
-        Final state with all analysis results
+        Initial ResearchState
     """
-    global _timing_data
-    _timing_data = {}
-    
-    # Initialize state
-    initial_state: ResearchState = {
+    return {
         "ticker": ticker.upper(),
         "horizon": horizon.lower(),
         "risk_profile": risk_profile.lower(),
@@ -106,13 +118,58 @@ def run_research_analysis(ticker: str, horizon: str, risk_profile: str) -> Dict[
         "scenarios": {},
         "recommendation": "",
         "confidence_score": 0.0,
-        "memo": ""
+        "memo": "",
+        "_agent_timing": {}
     }
+
+
+async def run_research_analysis_async(ticker: str, horizon: str, risk_profile: str) -> Dict[str, Any]:
+    """
+    Run the research pipeline on the current event loop.
+    
+    Several tickers can be analyzed concurrently by gathering this
+    coroutine; they share the per-loop LLM semaphore and HTTP client.
+    
+    Args:
+        ticker: Stock ticker symbol
+        horizon: Time horizon (short/medium/long)
+        risk_profile: Risk profile (conservative/moderate/aggressive)
+    
+    Returns:
+        Final state with all analysis results
+    """
+    graph_start = time.time()
+    result = await run_pipeline(create_initial_state(ticker, horizon, risk_profile))
+    result["_total_analysis_time"] = time.time() - graph_start
+    
+    return result
+
+
+def run_research_analysis(ticker: str, horizon: str, risk_profile: str) -> Dict[str, Any]:
+    """
+    Run the complete research analysis pipeline.
+    
+    Args:
+        ticker: Stock ticker symbol
+        horizon: Time horizon (short/medium/long)
+        risk_profile: Risk profile (conservative/moderate/aggressive)
+    
+    Returns:
+        Final state with all analysis results
+    """
+    global _timing_data
+    _timing_data = {}
+    
+    # Initialize state
+    initial_state = create_initial_state(ticker, horizon, risk_profile)
     
-    # Create and run graph with timing
+    # Run the pipeline with timing
     graph_start = time.time()
-    graph = create_research_graph()
-    result = graph.invoke(initial_state)
+    if USE_LANGGRAPH:
+        graph = create_research_graph()
+        result = graph.invoke(initial_state)
+    else:
+        result = run_async(run_pipeline(initial_state))
     graph_time = time.time() - graph_start
     
     # Store timing in result for main.py to access
@@ -8,18 +8,184 @@ import sys
 import time
 import json
 import os
-from graph.research_graph import run_research_analysis
+import asyncio
+import argparse
+from typing import Any, Dict, List, Optional
+from config import BATCH_CONCURRENCY
+from graph.research_graph import run_research_analysis, run_research_analysis_async
+from services.llm_service import get_gemini_service, run_async
+from services.logger import logger, configure_logging
+from tools.price_history import prefetch
+from tools.macro_data import get_macro_data_async
 
-# Force unbuffered output for real-time streaming
+# Agent progress goes through the analyst logger (stdout, flushed at agent
+# boundaries - or per line when JSON_OUTPUT=true for the streaming UI)
+configure_logging(sys.stdout)
+
+# Optional progress bar for batch runs
 try:
-    # Python 3.7+
-    sys.stdout.reconfigure(line_buffering=True)
-    sys.stderr.reconfigure(line_buffering=True)
-except AttributeError:
-    # Fallback for older Python versions
-    import io
-    sys.stdout = io.TextIOWrapper(sys.stdout.buffer, line_buffering=True)
-    sys.stderr = io.TextIOWrapper(sys.stderr.buffer, line_buffering=True)
+    from tqdm.asyncio import tqdm as tqdm_asyncio
+    TQDM_AVAILABLE = True
+except ImportError:
+    TQDM_AVAILABLE = False
+
+
+VALID_HORIZONS = ["short", "medium", "long"]
+VALID_RISK_PROFILES = ["conservative", "moderate", "aggressive"]
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    """
+    Parse command-line arguments.
+    
+    Single ticker:  python main.py <ticker> <horizon> <risk_profile>
+    Batch:          python main.py --batch tickers.txt [--horizon H] [--risk-profile R]
+                    python main.py --tickers AAPL MSFT [--horizon H] [--risk-profile R]
+    """
+    parser = argparse.ArgumentParser(description="AI-Powered Financial Research Analyst")
+    parser.add_argument("ticker", nargs="?", help="Stock ticker symbol (e.g., AAPL)")
+    parser.add_argument("horizon", nargs="?", help="short | medium | long")
+    parser.add_argument("risk_profile", nargs="?", help="conservative | moderate | aggressive")
+    parser.add_argument("--batch", metavar="PATH", help="File with one ticker per line")
+    parser.add_argument("--tickers", nargs="+", metavar="TICKER", help="Tickers to analyze concurrently")
+    parser.add_argument("--horizon", dest="batch_horizon", default="medium", help="Horizon for batch runs")
+    parser.add_argument("--risk-profile", dest="batch_risk_profile", default="moderate",
+                        help="Risk profile for batch runs")
+    return parser.parse_args(argv)
+
+
+def validate_inputs(horizon: str, risk_profile: str) -> None:
+    """Exit with an error message if horizon or risk_profile is invalid."""
+    if horizon not in VALID_HORIZONS:
+        print(f"Error: horizon must be one of {VALID_HORIZONS}")
+        sys.exit(1)
+    
+    if risk_profile not in VALID_RISK_PROFILES:
+        print(f"Error: risk_profile must be one of {VALID_RISK_PROFILES}")
+        sys.exit(1)
+
+
+def load_tickers(path: str) -> List[str]:
+    """
+    Read tickers from a file (one per line or comma-separated; # starts a comment).
+    
+    Args:
+        path: Ticker list file
+    
+    Returns:
+        Unique upper-cased tickers in file order
+    """
+    tickers = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.split("#", 1)[0]
+            tickers.extend(t.strip().upper() for t in line.split(",") if t.strip())
+    return list(dict.fromkeys(tickers))
+
+
+async def run_batch(tickers: List[str], horizon: str, risk_profile: str) -> Dict[str, Any]:
+    """
+    Analyze several tickers concurrently on one event loop.
+    
+    Args:
+        tickers: Ticker symbols
+        horizon: Time horizon
+        risk_profile: Risk profile
+    
+    Returns:
+        Mapping of ticker -> final state (or {"error": ...} on failure)
+    """
+    # Macro data is ticker-independent: fetch it once into the shared cache
+    # instead of one concurrent FRED/sector download per ticker
+    try:
+        await get_macro_data_async()
+        logger.info("[Batch] Prefetched macro data")
+    except Exception as e:
+        logger.warning("[Batch] Macro data prefetch skipped: %s", e)
+    
+    semaphore = asyncio.Semaphore(BATCH_CONCURRENCY)
+    
+    async def _one(ticker: str) -> Dict[str, Any]:
+        async with semaphore:
+            try:
+                return await run_research_analysis_async(ticker, horizon, risk_profile)
+            except Exception as e:
+                logger.error("[Batch] %s failed: %s", ticker, e)
+                return {"error": str(e)}
+    
+    coros = [_one(ticker) for ticker in tickers]
+    if TQDM_AVAILABLE:
+        results = await tqdm_asyncio.gather(*coros, desc="Tickers", file=sys.stderr)
+    else:
+        results = await asyncio.gather(*coros)
+    return dict(zip(tickers, results))
+
+
+def main_batch(tickers: List[str], horizon: str, risk_profile: str) -> None:
+    """
+    Run batch analysis and print a per-ticker summary.
+    
+    Args:
+        tickers: Ticker symbols
+        horizon: Time horizon
+        risk_profile: Risk profile
+    """
+    print(f"\n{'='*60}")
+    print(f"AI-Powered Financial Research Analyst - Batch")
+    print(f"{'='*60}")
+    print(f"Tickers: {', '.join(tickers)}")
+    print(f"Horizon: {horizon}")
+    print(f"Risk Profile: {risk_profile}")
+    print(f"Concurrency: {BATCH_CONCURRENCY}")
+    print(f"{'='*60}\n")
+    
+    overall_start = time.time()
+    
+    try:
+        get_gemini_service()
+    except Exception as e:
+        logger.warning("[Gemini] Warmup skipped: %s", e)
+    
+    # One batched download of every ticker's 1y history (plus the beta
+    # benchmark) instead of one request per ticker and tool
+    try:
+        fetched = prefetch(tickers)
+        logger.info("[Batch] Prefetched price history for %s tickers", fetched)
+    except Exception as e:
+        logger.warning("[Batch] Price history prefetch skipped: %s", e)
+    
+    results = run_async(run_batch(tickers, horizon, risk_profile))
+    overall_time = time.time() - overall_start
+    
+    print(f"\n{'='*60}")
+    print("BATCH COMPLETE")
+    print(f"{'='*60}")
+    for ticker, result in results.items():
+        if "error" in result:
+            print(f"  {ticker:<8} ERROR: {result['error']}")
+        else:
+            print(f"  {ticker:<8} {result.get('recommendation', 'N/A'):<5} "
+                  f"confidence {result.get('confidence_score', 0.0):.2f}  "
+                  f"memo: outputs/{ticker}_memo.md")
+    print(f"\n  {'TOTAL TIME':<20}: {int(overall_time // 60)}m {overall_time % 60:.1f}s ({overall_time:.1f}s)")
+    print(f"{'='*60}\n")
+    
+    if os.getenv('JSON_OUTPUT') == 'true':
+        json_output = {
+            ticker: {
+                "recommendation": result.get('recommendation', ''),
+                "confidence_score": result.get('confidence_score', 0),
+                "scenarios": result.get('scenarios', {}),
+                "error": result.get('error'),
+            }
+            for ticker, result in results.items()
+        }
+        print("\n===JSON_OUTPUT_START===")
+        print(json.dumps(json_output, indent=2))
+        print("===JSON_OUTPUT_END===")
+    
+    if any("error" in result for result in results.values()):
+        sys.exit(1)
 
 
 def main():
@@ -28,32 +194,39 @@ def main():
     
     Usage:
         python main.py <ticker> <horizon> <risk_profile>
+        python main.py --batch tickers.txt [--horizon medium] [--risk-profile moderate]
+        python main.py --tickers AAPL MSFT [--horizon medium] [--risk-profile moderate]
     
     Example:
         python main.py AAPL medium moderate
     """
-    if len(sys.argv) != 4:
+    args = parse_args()
+    
+    if args.batch or args.tickers:
+        tickers = load_tickers(args.batch) if args.batch else list(dict.fromkeys(t.upper() for t in args.tickers))
+        horizon = args.batch_horizon.lower()
+        risk_profile = args.batch_risk_profile.lower()
+        validate_inputs(horizon, risk_profile)
+        if not tickers:
+            print("Error: no tickers to analyze")
+            sys.exit(1)
+        main_batch(tickers, horizon, risk_profile)
+        return
+    
+    if not (args.ticker and args.horizon and args.risk_profile):
         print("Usage: python main.py <ticker> <horizon> <risk_profile>")
+        print("       python main.py --batch tickers.txt [--horizon H] [--risk-profile R]")
         print("  ticker: Stock ticker symbol (e.g., AAPL)")
         print("  horizon: short | medium | long")
         print("  risk_profile: conservative | moderate | aggressive")
         sys.exit(1)
     
-    ticker = sys.argv[1].upper()
-    horizon = sys.argv[2].lower()
-    risk_profile = sys.argv[3].lower()
+    ticker = args.ticker.upper()
+    horizon = args.horizon.lower()
+    risk_profile = args.risk_profile.lower()
     
     # Validate inputs
-    valid_horizons = ["short", "medium", "long"]
-    valid_risk_profiles = ["conservative", "moderate", "aggressive"]
-    
-    if horizon not in valid_horizons:
-        print(f"Error: horizon must be one of {valid_horizons}")
-        sys.exit(1)
-    
-    if risk_profile not in valid_risk_profiles:
-        print(f"Error: risk_profile must be one of {valid_risk_profiles}")
-        sys.exit(1)
+    validate_inputs(horizon, risk_profile)
     
     print(f"\n{'='*60}", flush=True)
     print(f"AI-Powered Financial Research Analyst", flush=True)
@@ -67,17 +240,20 @@ def main():
     overall_start = time.time()
     timing_info = {}
     
+    # Warm up Gemini (credentials + TLS connection) while data collection runs
+    try:
+        get_gemini_service()
+    except Exception as e:
+        logger.warning("[Gemini] Warmup skipped: %s", e)
+    
     try:
-        # No warmup needed with API-based LLMs (Gemini + Hugging Face)
-        # APIs are instant - no model loading required
-        
         # Run the research analysis
         analysis_start = time.time()
         result = run_research_analysis(ticker, horizon, risk_profile)
         analysis_time = time.time() - analysis_start
         timing_info["Analysis Pipeline"] = analysis_time
         
-        # Add detailed agent timing if available
+        # Add detailed agent timing if available (DEBUG_TIMING=1)
         agent_timing = result.get("_agent_timing", {})
         if agent_timing:
             for agent_name, agent_time in agent_timing.items():
@@ -139,7 +315,7 @@ def main():
         
     except Exception as e:
         overall_time = time.time() - overall_start
-        print(f"\nError running analysis after {overall_time:.1f}s: {e}")
+        logger.error("\nError running analysis after %.1fs: %s", overall_time, e)
         import traceback
         traceback.print_exc()
         sys.exit(1)
@@ -0,0 +1,82 @@
+"""
+Prompt Context
+
+Flat view of the state fields that feed the agent prompts.
+"""
+
+from dataclasses import dataclass
+from typing import Dict, Any, Optional
+
+UNKNOWN = "Unknown"
+
+# Market/macro fields substituted when missing
+_DATA_FIELDS = ("price_trend", "pe_ratio", "rsi",
+                "interest_rate_trend", "inflation_trend", "market_trend")
+
+
+@dataclass(slots=True)
+class PromptContext:
+    """
+    Prompt inputs resolved once per request.
+
+    Prompt builders read attributes directly instead of walking nested
+    state dicts; missing values fall back to "Unknown".
+    """
+
+    ticker: str
+    horizon: str = "medium"
+    risk_profile: str = "moderate"
+
+    # Market data
+    price_trend: Any = None
+    pe_ratio: Any = None
+    rsi: Any = None
+
+    # Macro data
+    interest_rate_trend: Any = None
+    inflation_trend: Any = None
+    market_trend: Any = None
+
+    def __post_init__(self):
+        for name in _DATA_FIELDS:
+            if getattr(self, name) is None:
+                setattr(self, name, UNKNOWN)
+
+    @classmethod
+    def from_data(cls, ticker: str, market_data: Optional[Dict[str, Any]],
+                  macro_data: Optional[Dict[str, Any]],
+                  horizon: str = "medium", risk_profile: str = "moderate",
+                  missing: str = UNKNOWN) -> "PromptContext":
+        """
+        Build a prompt context from market and macro data dicts.
+
+        Args:
+            ticker: Stock ticker
+            market_data: Market data dictionary
+            macro_data: Macro data dictionary
+            horizon: Time horizon
+            risk_profile: Risk profile
+            missing: Placeholder for missing values (the memo prompt uses "N/A")
+
+        Returns:
+            PromptContext
+        """
+        market_data = market_data or {}
+        macro_data = macro_data or {}
+        valuation = market_data.get("valuation") or {}
+        technicals = market_data.get("technical_indicators") or {}
+
+        values = {
+            "price_trend": market_data.get("price_trend"),
+            "pe_ratio": valuation.get("pe_ratio"),
+            "rsi": technicals.get("rsi"),
+            "interest_rate_trend": macro_data.get("interest_rate_trend"),
+            "inflation_trend": macro_data.get("inflation_trend"),
+            "market_trend": macro_data.get("market_trend"),
+        }
+        return cls(
+            ticker=ticker,
+            horizon=horizon,
+            risk_profile=risk_profile,
+            **{name: missing if value is None else value for name, value in values.items()},
+        )
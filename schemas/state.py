@@ -4,12 +4,28 @@ Shared State Schema
 Defines the ResearchState TypedDict that LangGraph passes between agents.
 """
 
+import os
+import threading
 from typing import TypedDict, Dict, Any
+from schemas.context import PromptContext, UNKNOWN
+
+# Per-agent timing breakdown (state["_agent_timing"]) - debugging only.
+# Read here rather than from config, which would pull in the LLM services
+DEBUG_TIMING = os.getenv("DEBUG_TIMING", "0") == "1"
 
 
 class ResearchState(TypedDict):
-    """State object passed between agents in the research graph."""
-    
+    """
+    State object passed between agents in the research graph.
+
+    Ownership contract: each agent owns exactly one top-level key and only
+    writes that key (market_data_agent -> market_data, macro_trends_agent ->
+    macro_data, risk agent -> risk_analysis, scenario agent -> scenarios,
+    memo_writer_agent -> recommendation/confidence_score/memo). Agents that
+    run concurrently therefore share one state object without copying.
+    The only shared key is _agent_timing, written via record_agent_timing.
+    """
+
     ticker: str
     horizon: str
     risk_profile: str
@@ -23,3 +39,46 @@ class ResearchState(TypedDict):
     confidence_score: float
     memo: str
 
+    _agent_timing: Dict[str, float]
+
+
+_timing_lock = threading.Lock()
+
+
+def record_agent_timing(state: ResearchState, **timings: float) -> None:
+    """
+    Record agent timings (seconds) in state["_agent_timing"].
+
+    No-op unless DEBUG_TIMING=1. Concurrent agents all write this key,
+    so the dict is swapped for a merged copy under a lock rather than
+    mutated in place.
+
+    Args:
+        state: Current research state
+        **timings: Timing name -> seconds
+    """
+    if not DEBUG_TIMING:
+        return
+    with _timing_lock:
+        state["_agent_timing"] = {**state.get("_agent_timing", {}), **timings}
+
+
+def build_prompt_context(state: ResearchState, missing: str = UNKNOWN) -> PromptContext:
+    """
+    Resolve the prompt inputs from state once per agent call.
+
+    Args:
+        state: Current research state
+        missing: Placeholder for missing fields
+
+    Returns:
+        PromptContext with `missing` for missing fields
+    """
+    return PromptContext.from_data(
+        state.get("ticker", ""),
+        state.get("market_data"),
+        state.get("macro_data"),
+        horizon=state.get("horizon", "medium"),
+        risk_profile=state.get("risk_profile", "moderate"),
+        missing=missing,
+    )
@@ -5,11 +5,24 @@ Abstract LLM interface with Gemini and Hugging Face implementations.
 """
 
 import os
+import re
 import json
 import time
+import random
+import asyncio
+import hashlib
+import sqlite3
+import threading
+import weakref
+import importlib.util
+from collections import deque, OrderedDict
 import requests
-from typing import Optional, Dict, Any, List
+import httpx
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from typing import Optional, Dict, Any, List, Tuple, Iterator, AsyncIterator, Callable, Awaitable, TypeVar
 from dotenv import load_dotenv
+from services.logger import logger
 
 # Load environment variables
 load_dotenv()
@@ -18,92 +31,1203 @@ load_dotenv()
 GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
 HUGGINGFACE_API_KEY = os.getenv("HUGGINGFACE_API_KEY")
 
+# Max in-flight LLM calls per event loop (keeps parallel agents under the QPM limit)
+GEMINI_CONCURRENCY = int(os.getenv("GEMINI_CONCURRENCY", "4"))
+
+# LLM response cache (exact + semantic); LLM_CACHE=0 disables it
+LLM_CACHE_ENABLED = os.getenv("LLM_CACHE", "1") != "0"
+LLM_CACHE_PATH = os.getenv("LLM_CACHE_PATH", os.path.join(".cache", "llm_cache.db"))
+LLM_CACHE_TTL = float(os.getenv("LLM_CACHE_TTL", str(24 * 60 * 60)))
+# Semantic (embedding-similarity) hits are opt-in: the agent prompts differ
+# only in ticker and a few numbers, so near-duplicates are not equivalent
+LLM_SEMANTIC_CACHE = os.getenv("LLM_SEMANTIC_CACHE", "0") == "1"
+
 # Use REST API directly for more reliable access
 GEMINI_AVAILABLE = True
 GEMINI_API_BASE = "https://generativelanguage.googleapis.com/v1"
+# Raw Inference API endpoint for the async Hugging Face path
+HF_API_BASE = "https://api-inference.huggingface.co/models"
+# JSON mode (responseSchema) is only exposed on v1beta
+GEMINI_API_BETA = "https://generativelanguage.googleapis.com/v1beta"
+
+# Candidate models in fallback order; the first one that answers is kept
+# at the front of the instance's list for later calls
+GEMINI_MODELS = (
+    "gemini-2.5-flash",      # Latest fast model
+    "gemini-2.0-flash",      # Alternative fast model
+    "gemini-2.5-pro",        # More capable model
+    "gemini-2.0-flash-001",  # Specific version
+    "gemini-1.5-flash-latest", # Fallback (may not exist)
+    "gemini-1.5-flash",      # Fallback
+    "gemini-pro"             # Fallback
+)
+
+# Endpoint URLs for the candidate models, formatted once at import
+MODEL_URLS = {
+    (api_base, model, method): f"{api_base}/models/{model}:{method}"
+    for api_base in (GEMINI_API_BASE, GEMINI_API_BETA)
+    for model in GEMINI_MODELS
+    for method in ("generateContent", "streamGenerateContent")
+}
+
+
+def model_url(api_base: str, model: str, method: str = "generateContent") -> str:
+    """Return the endpoint URL for a model (formatted on the fly if not precomputed)."""
+    url = MODEL_URLS.get((api_base, model, method))
+    return url if url is not None else f"{api_base}/models/{model}:{method}"
+
 
+# generationConfig fields for JSON mode (served from v1beta)
+JSON_MODE_FIELDS = ("responseMimeType", "responseSchema")
+
+# Output cap for the JSON-mode agent calls. gemini-2.5 models count thinking
+# tokens against maxOutputTokens, so a cap sized for the ~100-300 token JSON
+# alone ends in MAX_TOKENS with no text (and a failover to another model)
+JSON_MAX_OUTPUT_TOKENS = 2048
+
+# Retries for transient Gemini failures (429 / 5xx / timeouts), exponential
+# backoff with jitter; the circuit opens after repeated failures
+LLM_MAX_ATTEMPTS = int(os.getenv("LLM_MAX_ATTEMPTS", "3"))
+LLM_RETRY_BASE_DELAY = 1.0
+LLM_RETRY_MAX_DELAY = 8.0
+CIRCUIT_FAILURE_THRESHOLD = 5
+CIRCUIT_WINDOW_SECONDS = 60
+CIRCUIT_COOLDOWN_SECONDS = 30
+
+# Shared pooled session for the blocking Gemini calls (keeps TLS connections
+# alive across calls). The adapter only retries connection failures; status
+# codes are handled by the model fallback and retry/circuit-breaker logic.
+_SESSION = requests.Session()
+_SESSION.mount("https://", HTTPAdapter(
+    pool_connections=10,
+    pool_maxsize=20,
+    max_retries=Retry(total=3, connect=3, read=0, status=0, backoff_factor=0.5,
+                      allowed_methods=["GET", "POST"])
+))
+
+# huggingface_hub is only imported when a HuggingFaceService is created,
+# so Gemini-only processes never pay for it
+HF_AVAILABLE = importlib.util.find_spec("huggingface_hub") is not None
+if not HF_AVAILABLE:
+    logger.warning("Warning: huggingface_hub not installed. Install with: pip install huggingface_hub")
+
+# orjson (de)serializes request/response bodies faster than the stdlib json module (optional)
 try:
-    from huggingface_hub import InferenceClient
-    HF_AVAILABLE = True
+    import orjson
+    _json_loads = orjson.loads
+    _json_dumps = orjson.dumps
+    ORJSON_AVAILABLE = True
 except ImportError:
-    HF_AVAILABLE = False
-    print("Warning: huggingface_hub not installed. Install with: pip install huggingface_hub")
+    _json_loads = json.loads
+
+    def _json_dumps(obj: Any) -> bytes:
+        return json.dumps(obj).encode("utf-8")
+    ORJSON_AVAILABLE = False
+
+# Request bodies are pre-serialized (see _json_dumps) and sent as raw bytes
+JSON_HEADERS = {"Content-Type": "application/json"}
+
+# HTTP/2 for the async client needs the h2 extra (pip install httpx[http2])
+try:
+    import h2  # noqa: F401
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+# Semantic cache lookups are optional - they need sentence-transformers
+from services.semantic_cache import SEMANTIC_CACHE_AVAILABLE, EMBEDDING_DIM, STORAGE_DTYPE, embed
+
+# Case/whitespace folding for the normalized exact-match key
+_WHITESPACE = re.compile(r"\s+")
+
+
+class ExactCache:
+    """Bounded in-memory LRU map from prompt hash to response."""
+    
+    def __init__(self, maxsize: int = 4096):
+        """
+        Initialize exact cache.
+        
+        Args:
+            maxsize: Maximum number of entries
+        """
+        self.maxsize = maxsize
+        self._data: "OrderedDict[str, Any]" = OrderedDict()
+        self._lock = threading.Lock()
+    
+    def get(self, key: str) -> Any:
+        """Return the cached value (None on miss)."""
+        with self._lock:
+            value = self._data.get(key)
+            if value is not None:
+                self._data.move_to_end(key)
+            return value
+    
+    def set(self, key: str, value: Any) -> None:
+        """Store a value, evicting the least recently used entry when full."""
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            if len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+
+class GenerativeCache:
+    """
+    LLM response cache backed by SQLite.
+    
+    Lookups try an exact match on SHA256(model, temperature, prompt) first
+    (served from an in-memory LRU in front of SQLite when recently used),
+    then the same hash over the prompt with case and whitespace runs folded,
+    then - only when semantic matching is enabled (LLM_SEMANTIC_CACHE=1) and
+    sentence-transformers is installed - a semantic match: cosine similarity
+    of the prompt embedding against the most recent entries.
+    """
+    
+    def __init__(self, path: str = LLM_CACHE_PATH, ttl: float = LLM_CACHE_TTL,
+                 threshold: float = 0.97, max_scan: int = 1000,
+                 max_semantic_temperature: float = 0.5,
+                 semantic: bool = LLM_SEMANTIC_CACHE, memory_size: int = 4096):
+        """
+        Initialize generative cache.
+        
+        Args:
+            path: SQLite database path
+            ttl: Entry time-to-live in seconds
+            threshold: Minimum cosine similarity for a semantic hit
+            max_scan: Number of recent embeddings scanned per semantic lookup
+            max_semantic_temperature: Above this temperature only exact hits
+                are served, to preserve response diversity
+            semantic: Serve semantic (similar-prompt) hits at all
+            memory_size: Entries kept in the in-memory exact-match tier
+        """
+        self.path = path
+        self.semantic = semantic
+        self.ttl = ttl
+        self.threshold = threshold
+        self.max_semantic_temperature = max_semantic_temperature
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+        self._memory = ExactCache(memory_size)
+        self._recent_keys: deque = deque(maxlen=max_scan)
+        self._recent_embeddings: deque = deque(maxlen=max_scan)
+    
+    @staticmethod
+    def make_key(model: str, temperature: float, prompt: str) -> str:
+        """Build the exact-match key for a prompt."""
+        return hashlib.sha256(f"{model}|{temperature}|{prompt}".encode("utf-8")).hexdigest()
+    
+    @classmethod
+    def make_keys(cls, model: str, temperature: float, prompt: str, options: str = "") -> Tuple[str, str]:
+        """
+        Build the exact and the case/whitespace-normalized keys for a prompt.
+        
+        Args:
+            model: Model name
+            temperature: Generation temperature
+            prompt: Prompt text
+            options: Serialized generation options (not normalized)
+        
+        Returns:
+            (exact key, normalized key) - equal when the prompt is already normalized
+        """
+        normalized = _WHITESPACE.sub(" ", prompt.strip().lower())
+        return cls.make_key(model, temperature, prompt + options), cls.make_key(model, temperature, normalized + options)
+    
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            self._conn = sqlite3.connect(self.path, check_same_thread=False)
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS llm_cache ("
+                "prompt_hash TEXT PRIMARY KEY, response BLOB, embedding BLOB, ts REAL)"
+            )
+            # Warm the semantic index with the most recent embeddings
+            if self.semantic and SEMANTIC_CACHE_AVAILABLE:
+                import numpy as np
+                rows = self._conn.execute(
+                    "SELECT prompt_hash, embedding FROM llm_cache WHERE embedding IS NOT NULL "
+                    "ORDER BY ts DESC LIMIT ?", (self._recent_keys.maxlen,)
+                ).fetchall()
+                for key, blob in reversed(rows):
+                    # Rows written before float16 storage hold float32 blobs
+                    dtype = STORAGE_DTYPE if len(blob) < 4 * EMBEDDING_DIM else np.float32
+                    self._recent_keys.append(key)
+                    self._recent_embeddings.append(np.frombuffer(blob, dtype=dtype).astype(STORAGE_DTYPE))
+        return self._conn
+    
+    def _fetch(self, key: str) -> Optional[str]:
+        row = self._connect().execute(
+            "SELECT response, ts FROM llm_cache WHERE prompt_hash = ?", (key,)
+        ).fetchone()
+        if row is None or time.time() - row[1] > self.ttl:
+            return None
+        response = row[0]
+        return response.decode("utf-8") if isinstance(response, bytes) else response
+    
+    def _memory_get(self, key: str) -> Optional[str]:
+        """In-memory tier lookup, honouring the same TTL as the SQLite rows."""
+        entry = self._memory.get(key)
+        if entry is None or time.time() - entry[0] > self.ttl:
+            return None
+        return entry[1]
+    
+    def lookup(self, keys: Tuple[str, str], prompt: str, temperature: float) -> Tuple[Optional[str], Any]:
+        """
+        Look up a cached response.
+        
+        Args:
+            keys: Exact and normalized keys from make_keys
+            prompt: Prompt text (for the semantic lookup)
+            temperature: Generation temperature
+        
+        Returns:
+            (response or None, prompt embedding or None) - pass the
+            embedding back to store() on a miss to avoid re-encoding
+        """
+        if not LLM_CACHE_ENABLED:
+            return None, None
+        
+        try:
+            key, normalized_key = keys
+            response = self._memory_get(key) or self._memory_get(normalized_key)
+            if response is not None:
+                return response, None
+            
+            with self._lock:
+                response = self._fetch(key)
+                if response is None and normalized_key != key:
+                    response = self._fetch(normalized_key)
+                if response is not None:
+                    self._memory.set(key, (time.time(), response))
+                    return response, None
+                
+                if not self.semantic or temperature > self.max_semantic_temperature:
+                    return None, None
+                
+                embedding = embed(prompt)
+                if embedding is None or not self._recent_embeddings:
+                    return None, embedding
+                
+                import numpy as np
+                sims = np.vstack(self._recent_embeddings).astype(np.float32) @ embedding
+                best = int(np.argmax(sims))
+                if sims[best] >= self.threshold:
+                    response = self._fetch(self._recent_keys[best])
+                    if response is not None:
+                        return response, embedding
+                return None, embedding
+        except Exception as e:
+            # Cache is best-effort - fall through to the LLM
+            logger.error("[LLM Cache] Lookup failed: %s", e)
+            return None, None
+    
+    def store(self, keys: Tuple[str, str], response: str, embedding: Any = None) -> None:
+        """
+        Store a response under its exact and normalized keys.
+        
+        Args:
+            keys: Exact and normalized keys from make_keys
+            response: LLM response text
+            embedding: Prompt embedding returned by lookup (optional)
+        """
+        if not LLM_CACHE_ENABLED:
+            return
+        
+        try:
+            key, normalized_key = keys
+            with self._lock:
+                conn = self._connect()
+                if embedding is not None:
+                    embedding = embedding.astype(STORAGE_DTYPE)
+                blob = embedding.tobytes() if embedding is not None else None
+                now = time.time()
+                rows = [(key, response.encode("utf-8"), blob, now)]
+                if normalized_key != key:
+                    # No embedding: the semantic index points at the exact row
+                    rows.append((normalized_key, response.encode("utf-8"), None, now))
+                conn.executemany(
+                    "INSERT OR REPLACE INTO llm_cache (prompt_hash, response, embedding, ts) "
+                    "VALUES (?, ?, ?, ?)",
+                    rows
+                )
+                conn.commit()
+                self._memory.set(key, (now, response))
+                self._memory.set(normalized_key, (now, response))
+                if embedding is not None:
+                    self._recent_keys.append(key)
+                    self._recent_embeddings.append(embedding)
+        except Exception as e:
+            logger.error("[LLM Cache] Store failed: %s", e)
+
+
+_response_cache = GenerativeCache()
+
+
+class TransientLLMError(Exception):
+    """Rate limit / server error worth retrying after a backoff."""
+
+
+class CircuitOpen(Exception):
+    """Raised without calling the API while the circuit breaker is open."""
+
+
+class CircuitBreaker:
+    """
+    Fail fast after repeated transient failures.
+    
+    Opens when `threshold` failures land within `window` seconds and
+    stays open for `cooldown` seconds, so callers fall back immediately
+    instead of queueing more requests against a struggling API.
+    """
+    
+    def __init__(self, threshold: int = CIRCUIT_FAILURE_THRESHOLD,
+                 window: float = CIRCUIT_WINDOW_SECONDS,
+                 cooldown: float = CIRCUIT_COOLDOWN_SECONDS):
+        """
+        Initialize circuit breaker.
+        
+        Args:
+            threshold: Failures within the window that open the circuit
+            window: Failure counting window in seconds
+            cooldown: Seconds the circuit stays open
+        """
+        self.threshold = threshold
+        self.window = window
+        self.cooldown = cooldown
+        self._failures: deque = deque()
+        self._opened_at: Optional[float] = None
+        self._lock = threading.Lock()
+    
+    def check(self) -> None:
+        """Raise CircuitOpen if calls should currently fail fast."""
+        with self._lock:
+            if self._opened_at is None:
+                return
+            if time.time() - self._opened_at < self.cooldown:
+                raise CircuitOpen(f"Gemini circuit open after {self.threshold} failures; retry later")
+            # Cooldown over - let calls through again
+            self._opened_at = None
+            self._failures.clear()
+    
+    def record_failure(self) -> None:
+        """Count a transient failure, opening the circuit past the threshold."""
+        with self._lock:
+            now = time.time()
+            self._failures.append(now)
+            while self._failures and now - self._failures[0] > self.window:
+                self._failures.popleft()
+            if len(self._failures) >= self.threshold:
+                self._opened_at = now
+    
+    def record_success(self) -> None:
+        """Reset the failure count."""
+        with self._lock:
+            self._failures.clear()
+
+
+_gemini_breaker = CircuitBreaker()
+
+
+def _is_transient(exc: BaseException) -> bool:
+    """Whether an LLM call failure is worth retrying."""
+    return isinstance(exc, (
+        TransientLLMError,
+        requests.exceptions.Timeout,
+        requests.exceptions.ConnectionError,
+        httpx.TimeoutException,
+        httpx.NetworkError,
+    ))
+
+
+def _retry_delay(attempt: int) -> float:
+    """Exponential backoff with jitter for the given (0-based) attempt."""
+    return min(LLM_RETRY_MAX_DELAY, LLM_RETRY_BASE_DELAY * 2 ** attempt) + random.uniform(0, 0.5)
+
+
+T = TypeVar("T")
+
+
+def _call_with_retries(call: Callable[[], T]) -> T:
+    """
+    Run a Gemini call, retrying transient failures behind the circuit breaker.
+    
+    Args:
+        call: Single attempt (raises on failure)
+    
+    Returns:
+        The attempt's result
+    
+    Raises:
+        CircuitOpen: if the circuit breaker is open
+    """
+    for attempt in range(LLM_MAX_ATTEMPTS):
+        _gemini_breaker.check()
+        try:
+            result = call()
+        except Exception as e:
+            if not _is_transient(e):
+                raise
+            _gemini_breaker.record_failure()
+            if attempt == LLM_MAX_ATTEMPTS - 1:
+                raise
+            delay = _retry_delay(attempt)
+            logger.warning("[Gemini] Transient error (%s); retrying in %.1fs", e, delay)
+            time.sleep(delay)
+        else:
+            _gemini_breaker.record_success()
+            return result
+
+
+async def _acall_with_retries(call: Callable[[], Awaitable[T]]) -> T:
+    """Async variant of _call_with_retries (call returns a fresh awaitable per attempt)."""
+    for attempt in range(LLM_MAX_ATTEMPTS):
+        _gemini_breaker.check()
+        try:
+            result = await call()
+        except Exception as e:
+            if not _is_transient(e):
+                raise
+            _gemini_breaker.record_failure()
+            if attempt == LLM_MAX_ATTEMPTS - 1:
+                raise
+            delay = _retry_delay(attempt)
+            logger.warning("[Gemini] Transient error (%s); retrying in %.1fs", e, delay)
+            await asyncio.sleep(delay)
+        else:
+            _gemini_breaker.record_success()
+            return result
+
+
+# Markdown code fence around a JSON payload (closing fence optional, so
+# responses cut off by maxOutputTokens still yield their body)
+_JSON_FENCE = re.compile(r"```(?:json)?\s*(.*?)(?:```|$)", re.DOTALL)
+
+
+def strip_json_fence(response_text: str) -> str:
+    """Return the body of the first markdown code fence, or the stripped text."""
+    match = _JSON_FENCE.search(response_text)
+    return match.group(1).strip() if match else response_text.strip()
+
+
+class _TryNextModel(Exception):
+    """Raised when a Gemini response means the next candidate model should be tried."""
+
+
+def _extract_json(response_text: str, provider: str) -> Dict[str, Any]:
+    """
+    Parse a JSON object out of an LLM response, stripping markdown fences.
+    
+    Args:
+        response_text: Raw LLM response
+        provider: Provider name for error messages
+    
+    Returns:
+        Parsed JSON dictionary
+    """
+    try:
+        # Remove markdown code blocks if present
+        response_text = strip_json_fence(response_text)
+        return _json_loads(response_text)
+    except json.JSONDecodeError as e:
+        logger.error("Error parsing JSON from %s: %s", provider, e)
+        logger.error("Response text: %s...", response_text[:200])
+        raise
 
 
 class LLMService:
     """Base class for LLM services."""
     
-    def invoke(self, prompt: str, **kwargs) -> str:
+    provider = "LLM"
+    
+    def invoke(self, prompt: str, **kwargs) -> str:
+        """
+        Invoke LLM with prompt.
+        
+        Args:
+            prompt: Input prompt
+            **kwargs: Additional parameters (temperature, etc.)
+        
+        Returns:
+            LLM response text
+        """
+        raise NotImplementedError
+    
+    def stream(self, prompt: str, **kwargs) -> Iterator[str]:
+        """
+        Stream the LLM response as text chunks.
+        
+        Default yields the full invoke result as a single chunk; services
+        with a streaming endpoint override this.
+        
+        Args:
+            prompt: Input prompt
+            **kwargs: Additional parameters (temperature, etc.)
+        
+        Yields:
+            Response text chunks
+        """
+        yield self.invoke(prompt, **kwargs)
+    
+    async def ainvoke(self, prompt: str, **kwargs) -> str:
+        """
+        Async variant of invoke.
+        
+        Default runs the blocking invoke on a worker thread; services with
+        a native async client override this.
+        
+        Args:
+            prompt: Input prompt
+            **kwargs: Additional parameters (temperature, etc.)
+        
+        Returns:
+            LLM response text
+        """
+        return await asyncio.to_thread(self.invoke, prompt, **kwargs)
+    
+    async def astream(self, prompt: str, **kwargs) -> AsyncIterator[str]:
+        """
+        Async variant of stream.
+        
+        Default yields the full ainvoke result as a single chunk.
+        
+        Args:
+            prompt: Input prompt
+            **kwargs: Additional parameters (temperature, etc.)
+        
+        Yields:
+            Response text chunks
+        """
+        yield await self.ainvoke(prompt, **kwargs)
+    
+    async def ainvoke_json(self, prompt: str, **kwargs) -> Dict[str, Any]:
+        """
+        Async variant of invoke_json.
+        
+        Args:
+            prompt: Input prompt (should request JSON output)
+            **kwargs: Additional parameters (temperature, etc.)
+        
+        Returns:
+            Parsed JSON dictionary
+        """
+        response_text = await self.ainvoke(prompt, **kwargs)
+        return _extract_json(response_text, self.provider)
+    
+    async def batch_ainvoke(self, prompts: List[str], max_concurrency: Optional[int] = None,
+                            **kwargs) -> List[str]:
+        """
+        Invoke independent prompts concurrently.
+        
+        Args:
+            prompts: Input prompts
+            max_concurrency: Max in-flight requests (defaults to the shared
+                per-loop LLM semaphore, sized by GEMINI_CONCURRENCY)
+            **kwargs: Additional parameters passed to every ainvoke call
+        
+        Returns:
+            Response texts in prompt order
+        """
+        if max_concurrency is None:
+            semaphore = get_llm_semaphore()
+        else:
+            semaphore = asyncio.Semaphore(max_concurrency)
+        
+        async def _one(prompt: str) -> str:
+            async with semaphore:
+                return await self.ainvoke(prompt, **kwargs)
+        
+        return await asyncio.gather(*(_one(prompt) for prompt in prompts))
+
+
+class PromptPrefix:
+    """
+    Static portion of a prompt (instructions + output schema).
+    
+    Prompts are sent as prefix + dynamic tail, so every call for an agent
+    starts with the identical text and benefits from Gemini's implicit
+    prefix caching.
+    """
+    
+    def __init__(self, name: str, text: str):
+        """
+        Initialize prompt prefix.
+        
+        Args:
+            name: Prefix name (e.g. "risk")
+            text: Static prefix text
+        """
+        self.name = name
+        self.text = text
+
+
+class GeminiService(LLMService):
+    """Gemini Flash LLM service using REST API."""
+    
+    provider = "Gemini"
+    
+    def __init__(self, api_key: Optional[str] = None, model: str = "gemini-2.5-flash"):
+        """
+        Initialize Gemini service.
+        
+        Args:
+            api_key: Gemini API key (defaults to GEMINI_API_KEY env var)
+            model: Model name (default: gemini-1.5-flash-latest)
+        """
+        self.api_key = api_key or GEMINI_API_KEY
+        if not self.api_key:
+            raise ValueError("GEMINI_API_KEY not found in environment variables")
+        
+        self.model_name = model
+        self.api_url = model_url(GEMINI_API_BASE, model)
+        self._discovery_lock = threading.Lock()
+        # Candidate list in fallback order; the working model is moved first
+        self._model_order: List[str] = list(GEMINI_MODELS)
+        # Set by a 404 - model discovery only runs once a model is missing
+        self._discovery_pending = False
+    
+    def warmup(self) -> threading.Thread:
+        """
+        Open the pooled TLS connection on a background thread.
+        
+        Takes the first handshake off the critical path of the first
+        agent call.
+        
+        Returns:
+            The started daemon thread
+        """
+        thread = threading.Thread(target=self._prime_connection, name="gemini-warmup", daemon=True)
+        thread.start()
+        return thread
+    
+    def _prime_connection(self) -> None:
+        """Send a cheap request so the session pool holds an open connection."""
+        try:
+            _SESSION.head(GEMINI_API_BASE, timeout=10)
+        except Exception:
+            pass
+    
+    def _test_api_key(self) -> bool:
+        """Test if API key is valid by listing models."""
+        try:
+            list_url = f"{GEMINI_API_BASE}/models"
+            response = _SESSION.get(
+                list_url,
+                params={"key": self.api_key},
+                timeout=10
+            )
+            if response.status_code == 200:
+                return True
+            else:
+                logger.error("API key test failed: %s - %s", response.status_code, response.text[:200])
+                return False
+        except Exception as e:
+            logger.error("API key test error: %s", e)
+            return False
+    
+    def _list_available_models(self) -> list:
+        """List available models for this API key."""
+        try:
+            list_url = f"{GEMINI_API_BASE}/models"
+            response = _SESSION.get(
+                list_url,
+                params={"key": self.api_key},
+                timeout=10
+            )
+            if response.status_code == 200:
+                data = response.json()
+                models = [m.get("name", "").replace("models/", "") for m in data.get("models", [])]
+                return models
+            return []
+        except Exception as e:
+            logger.error("Error listing models: %s", e)
+            return []
+    
+    def invoke(self, prompt: str, temperature: float = 0.7,
+               prefix: Optional[PromptPrefix] = None, **kwargs) -> str:
+        """
+        Invoke Gemini with prompt, serving repeat prompts from the response cache.
+        
+        Args:
+            prompt: Input prompt
+            temperature: Temperature for generation (0.0-1.0)
+            prefix: Static prompt prefix, prepended to the prompt
+            **kwargs: Additional parameters
+        
+        Returns:
+            Response text
+        """
+        full_prompt = prefix.text + prompt if prefix is not None else prompt
+        keys = _response_cache.make_keys(self.model_name, temperature, full_prompt, json.dumps(kwargs, sort_keys=True))
+        cached_text, embedding = _response_cache.lookup(keys, full_prompt, temperature)
+        if cached_text is not None:
+            logger.info("[Gemini] Served from response cache")
+            return cached_text
+        
+        text = self._invoke_uncached(full_prompt, temperature=temperature, **kwargs)
+        _response_cache.store(keys, text, embedding)
+        return text
+    
+    async def ainvoke(self, prompt: str, temperature: float = 0.7,
+                      prefix: Optional[PromptPrefix] = None, **kwargs) -> str:
+        """
+        Async variant of invoke over the shared pooled httpx.AsyncClient.
+        
+        Args:
+            prompt: Input prompt
+            temperature: Temperature for generation (0.0-1.0)
+            prefix: Static prompt prefix, prepended to the prompt
+            **kwargs: Additional parameters
+        
+        Returns:
+            Response text
+        """
+        full_prompt = prefix.text + prompt if prefix is not None else prompt
+        keys = _response_cache.make_keys(self.model_name, temperature, full_prompt, json.dumps(kwargs, sort_keys=True))
+        # SQLite and the embedding model block - keep them off the event loop
+        cached_text, embedding = await asyncio.to_thread(_response_cache.lookup, keys, full_prompt, temperature)
+        if cached_text is not None:
+            logger.info("[Gemini] Served from response cache")
+            return cached_text
+        
+        text = await self._ainvoke_uncached(full_prompt, temperature=temperature, **kwargs)
+        await asyncio.to_thread(_response_cache.store, keys, text, embedding)
+        return text
+    
+    def stream(self, prompt: str, temperature: float = 0.7,
+               prefix: Optional[PromptPrefix] = None, **kwargs) -> Iterator[str]:
+        """
+        Stream a Gemini response via :streamGenerateContent (SSE).
+        
+        Chunks are yielded as they arrive; the assembled text is stored in
+        the response cache once the stream completes.
+        
+        Args:
+            prompt: Input prompt
+            temperature: Temperature for generation (0.0-1.0)
+            prefix: Static prompt prefix, prepended to the prompt
+            **kwargs: Additional parameters
+        
+        Yields:
+            Response text chunks
+        """
+        full_prompt = prefix.text + prompt if prefix is not None else prompt
+        keys = _response_cache.make_keys(self.model_name, temperature, full_prompt, json.dumps(kwargs, sort_keys=True))
+        cached_text, embedding = _response_cache.lookup(keys, full_prompt, temperature)
+        if cached_text is not None:
+            logger.info("[Gemini] Served from response cache")
+            yield cached_text
+            return
+        
+        body = _json_dumps(self._build_payload(full_prompt, temperature, **kwargs))
+        # Opening the stream gets the same retry/circuit-breaker policy as
+        # invoke; once text has been yielded the caller holds a partial
+        # response, so later errors are raised instead of retried
+        response = _call_with_retries(lambda: self._open_stream(body))
+        
+        parts = []
+        try:
+            with response:
+                for line in response.iter_lines(decode_unicode=True):
+                    for text in self._sse_texts(line):
+                        parts.append(text)
+                        yield text
+        except Exception as e:
+            if _is_transient(e):
+                _gemini_breaker.record_failure()
+            raise
+        
+        self._store_streamed(keys, parts, embedding)
+    
+    def _open_stream(self, body: bytes) -> Any:
+        """
+        POST a streamGenerateContent request, falling back through candidate models.
+        
+        Args:
+            body: Serialized request body
+        
+        Returns:
+            Open streaming response (status 200) from the first model that answered
+        """
+        models_to_try = self._candidate_models()
+        last_error = None
+        for model in models_to_try:
+            is_last = model == models_to_try[-1]
+            api_url = model_url(GEMINI_API_BASE, model, "streamGenerateContent")
+            try:
+                response = _SESSION.post(
+                    api_url,
+                    params={"key": self.api_key, "alt": "sse"},
+                    data=body,
+                    headers=JSON_HEADERS,
+                    timeout=120,
+                    stream=True
+                )
+                if response.status_code != 200:
+                    try:
+                        self._handle_response(response, model, api_url, is_last)
+                    finally:
+                        response.close()
+                
+                self._mark_working_model(model, model_url(GEMINI_API_BASE, model))
+                return response
+            
+            except _TryNextModel as e:
+                last_error = str(e)
+                continue
+            except requests.exceptions.RequestException as e:
+                last_error = f"Request exception: {str(e)}"
+                if is_last:
+                    logger.error("Error calling Gemini API: %s", e)
+                    raise
+                continue
+        
+        # If we get here, all models failed
+        raise self._all_models_failed(last_error)
+    
+    async def astream(self, prompt: str, temperature: float = 0.7,
+                      prefix: Optional[PromptPrefix] = None, **kwargs) -> AsyncIterator[str]:
+        """
+        Async variant of stream over the shared pooled httpx.AsyncClient.
+        
+        Args:
+            prompt: Input prompt
+            temperature: Temperature for generation (0.0-1.0)
+            prefix: Static prompt prefix, prepended to the prompt
+            **kwargs: Additional parameters
+        
+        Yields:
+            Response text chunks
+        """
+        full_prompt = prefix.text + prompt if prefix is not None else prompt
+        keys = _response_cache.make_keys(self.model_name, temperature, full_prompt, json.dumps(kwargs, sort_keys=True))
+        cached_text, embedding = await asyncio.to_thread(_response_cache.lookup, keys, full_prompt, temperature)
+        if cached_text is not None:
+            logger.info("[Gemini] Served from response cache")
+            yield cached_text
+            return
+        
+        body = _json_dumps(self._build_payload(full_prompt, temperature, **kwargs))
+        # Retries only cover opening the stream (see stream)
+        response = await _acall_with_retries(lambda: self._aopen_stream(body))
+        
+        parts = []
+        try:
+            async for line in response.aiter_lines():
+                for text in self._sse_texts(line):
+                    parts.append(text)
+                    yield text
+        except Exception as e:
+            if _is_transient(e):
+                _gemini_breaker.record_failure()
+            raise
+        finally:
+            await response.aclose()
+        
+        await asyncio.to_thread(self._store_streamed, keys, parts, embedding)
+    
+    async def _aopen_stream(self, body: bytes) -> httpx.Response:
+        """
+        Async variant of _open_stream over the shared pooled httpx.AsyncClient.
+        
+        Args:
+            body: Serialized request body
+        
+        Returns:
+            Open streaming response (status 200); the caller must aclose() it
+        """
+        if self._discovery_pending:
+            models_to_try = await asyncio.to_thread(self._candidate_models)
+        else:
+            models_to_try = self._candidate_models()
+        client = get_async_client()
+        
+        last_error = None
+        for model in models_to_try:
+            is_last = model == models_to_try[-1]
+            api_url = model_url(GEMINI_API_BASE, model, "streamGenerateContent")
+            try:
+                request = client.build_request(
+                    "POST",
+                    api_url,
+                    params={"key": self.api_key, "alt": "sse"},
+                    content=body,
+                    headers=JSON_HEADERS,
+                    timeout=120
+                )
+                response = await client.send(request, stream=True)
+                if response.status_code != 200:
+                    try:
+                        await response.aread()
+                        self._handle_response(response, model, api_url, is_last)
+                    finally:
+                        await response.aclose()
+                
+                self._mark_working_model(model, model_url(GEMINI_API_BASE, model))
+                return response
+            
+            except _TryNextModel as e:
+                last_error = str(e)
+                continue
+            except httpx.HTTPError as e:
+                last_error = f"Request exception: {str(e)}"
+                if is_last:
+                    logger.error("Error calling Gemini API: %s", e)
+                    raise
+                continue
+        
+        # If we get here, all models failed
+        raise self._all_models_failed(last_error)
+    
+    @staticmethod
+    def _store_streamed(keys: Tuple[str, str], parts: List[str], embedding: Any) -> None:
+        """Cache a finished stream's text; empty ones (safety block, MAX_TOKENS) are skipped."""
+        text = "".join(parts).strip()
+        if text:
+            _response_cache.store(keys, text, embedding)
+    
+    @staticmethod
+    def _sse_texts(line: str) -> List[str]:
+        """Extract the text parts from one server-sent-events line."""
+        if not line or not line.startswith("data:"):
+            return []
+        chunk = _json_loads(line[len("data:"):])
+        candidates = chunk.get("candidates") or [{}]
+        return [part["text"] for part in candidates[0].get("content", {}).get("parts", []) if part.get("text")]
+    
+    def _candidate_models(self) -> List[str]:
+        """
+        Return model names to try, working model first.
+        
+        The static GEMINI_MODELS order is used until a model returns 404;
+        only then are the models available to the API key listed (once)
+        and moved to the front.
+        """
+        if self._discovery_pending:
+            # The lock makes concurrent callers wait for a single listing
+            with self._discovery_lock:
+                if self._discovery_pending:
+                    logger.info("[Gemini] Checking available models...")
+                    available_models = self._list_available_models()
+                    if available_models:
+                        logger.info("[Gemini] Available models: %s", ', '.join(available_models[:5]))
+                    self._available_models = available_models
+                    
+                    # Prefer models that are in our list
+                    order = self._model_order
+                    preferred = [m for m in order if m in available_models]
+                    self._model_order = preferred + [m for m in order if m not in preferred]
+                    self._discovery_pending = False
+        
+        return self._model_order
+    
+    def _mark_working_model(self, model: str, api_url: str) -> None:
+        """Remember the model that answered so later calls try it first."""
+        if model != self.model_name:
+            self.model_name = model
+            self.api_url = api_url
+        order = self._model_order
+        if order and order[0] != model and model in order:
+            self._model_order = [model] + [m for m in order if m != model]
+    
+    @staticmethod
+    def _api_base(generation_config: Dict[str, Any]) -> str:
+        """Pick the API version that supports the requested generationConfig."""
+        if any(field in generation_config for field in JSON_MODE_FIELDS):
+            return GEMINI_API_BETA
+        return GEMINI_API_BASE
+    
+    @staticmethod
+    def _build_payload(prompt: str, temperature: float, **kwargs) -> Dict[str, Any]:
+        """Build a generateContent request body."""
+        payload = {
+            "contents": [{
+                "parts": [{
+                    "text": prompt
+                }]
+            }],
+            "generationConfig": {
+                "temperature": temperature,
+                **kwargs
+            }
+        }
+        return payload
+    
+    def _handle_response(self, response: Any, model: str, api_url: str, is_last: bool) -> str:
+        """
+        Turn a generateContent HTTP response into text.
+        
+        Works with both requests and httpx responses.
+        
+        Args:
+            response: HTTP response
+            model: Model name the request was sent to
+            api_url: URL the request was sent to
+            is_last: Whether this is the last candidate model
+        
+        Returns:
+            Response text
+        
+        Raises:
+            _TryNextModel: if the next candidate model should be tried
+            Exception: on errors that should not fall through to other models
+        """
+        if response.status_code == 200:
+            result = _json_loads(response.content)
+            if "candidates" in result and len(result["candidates"]) > 0:
+                text = result["candidates"][0]["content"]["parts"][0]["text"]
+                self._mark_working_model(model, api_url)
+                return text.strip()
+            raise _TryNextModel("No candidates in response")
+        
+        # Parse the error body once for every branch below
+        try:
+            error_data = _json_loads(response.content) if response.content else {}
+        except ValueError:
+            error_data = {}
+        error = error_data.get("error") if isinstance(error_data, dict) else None
+        error_msg = error.get("message") if isinstance(error, dict) else None
+        
+        if response.status_code == 404:
+            # Try next model; list the available ones before the next call
+            if not hasattr(self, '_available_models'):
+                self._discovery_pending = True
+            raise _TryNextModel(error_msg or f"Model {model} not found (404)")
+        elif response.status_code == 400:
+            # Bad request - might be API key issue
+            # Don't try other models if it's a bad request
+            raise Exception(f"API Error 400: {error_msg or response.text[:200]}")
+        elif response.status_code == 401 or response.status_code == 403:
+            # Authentication error - don't try other models
+            error_msg = error_msg or "Invalid API key or permission denied"
+            raise Exception(f"Authentication Error ({response.status_code}): {error_msg}. Please check your GEMINI_API_KEY.")
+        elif response.status_code == 429:
+            # Rate limit - try next model, but warn user
+            if is_last:
+                raise TransientLLMError(f"Rate limit exceeded on all models. Please wait and try again, or check your quota at https://ai.dev/usage")
+            raise _TryNextModel(f"Rate limit (429): {error_msg or 'Rate limit exceeded'}")
+        else:
+            last_error = f"API Error {response.status_code}: {error_msg or response.text[:200]}"
+            if is_last:
+                if response.status_code >= 500:
+                    raise TransientLLMError(last_error)
+                raise Exception(last_error)
+            raise _TryNextModel(last_error)
+    
+    def _all_models_failed(self, last_error: Optional[str]) -> Exception:
+        """Build the error raised when every candidate model failed."""
+        error_msg = f"All model names failed. Last error: {last_error}"
+        if hasattr(self, '_available_models') and self._available_models:
+            error_msg += f"\nAvailable models: {', '.join(self._available_models[:10])}"
+        return Exception(error_msg)
+    
+    def _invoke_uncached(self, prompt: str, temperature: float = 0.7, **kwargs) -> str:
         """
-        Invoke LLM with prompt.
+        Invoke Gemini, retrying transient failures behind the circuit breaker.
         
         Args:
             prompt: Input prompt
-            **kwargs: Additional parameters (temperature, etc.)
+            temperature: Temperature for generation (0.0-1.0)
+            **kwargs: Additional parameters
         
         Returns:
-            LLM response text
+            Response text
+        
+        Raises:
+            CircuitOpen: if the circuit breaker is open
         """
-        raise NotImplementedError
-
-
-class GeminiService(LLMService):
-    """Gemini Flash LLM service using REST API."""
+        return _call_with_retries(
+            lambda: self._invoke_attempt(prompt, temperature, **kwargs))
     
-    def __init__(self, api_key: Optional[str] = None, model: str = "gemini-2.5-flash"):
+    def _invoke_attempt(self, prompt: str, temperature: float = 0.7, **kwargs) -> str:
         """
-        Initialize Gemini service.
+        Invoke Gemini with prompt using REST API (single attempt).
         
         Args:
-            api_key: Gemini API key (defaults to GEMINI_API_KEY env var)
-            model: Model name (default: gemini-1.5-flash-latest)
-        """
-        self.api_key = api_key or GEMINI_API_KEY
-        if not self.api_key:
-            raise ValueError("GEMINI_API_KEY not found in environment variables")
+            prompt: Input prompt
+            temperature: Temperature for generation (0.0-1.0)
+            **kwargs: Additional parameters
         
-        self.model_name = model
-        self.api_url = f"{GEMINI_API_BASE}/models/{model}:generateContent"
+        Returns:
+            Response text
+        """
+        payload = self._build_payload(prompt, temperature, **kwargs)
+        return self._generate(payload, self._candidate_models(), self._api_base(kwargs))
     
-    def _test_api_key(self) -> bool:
-        """Test if API key is valid by listing models."""
-        try:
-            list_url = f"{GEMINI_API_BASE}/models"
-            response = requests.get(
-                list_url,
-                params={"key": self.api_key},
-                timeout=10
-            )
-            if response.status_code == 200:
-                return True
-            else:
-                print(f"API key test failed: {response.status_code} - {response.text[:200]}")
-                return False
-        except Exception as e:
-            print(f"API key test error: {e}")
-            return False
+    def _generate(self, payload: Dict[str, Any], models_to_try: List[str], api_base: str) -> str:
+        """
+        POST a generateContent payload, falling back through candidate models.
+        
+        Args:
+            payload: Request body
+            models_to_try: Model names in preference order
+            api_base: API base URL (v1, or v1beta for JSON mode)
+        
+        Returns:
+            Response text
+        """
+        # Serialized once, reused across the model fallback
+        body = _json_dumps(payload)
+        
+        last_error = None
+        for model in models_to_try:
+            is_last = model == models_to_try[-1]
+            try:
+                api_url = model_url(api_base, model)
+                
+                response = _SESSION.post(
+                    api_url,
+                    params={"key": self.api_key},
+                    data=body,
+                    headers=JSON_HEADERS,
+                    timeout=120
+                )
+                
+                return self._handle_response(response, model, api_url, is_last)
+            
+            except _TryNextModel as e:
+                last_error = str(e)
+                continue
+            except requests.exceptions.RequestException as e:
+                last_error = f"Request exception: {str(e)}"
+                if is_last:
+                    logger.error("Error calling Gemini API: %s", e)
+                    raise
+                continue
+            except Exception as e:
+                # If it's an auth error or bad request, don't try other models
+                if "Authentication" in str(e) or "400" in str(e):
+                    raise
+                last_error = str(e)
+                if is_last:
+                    logger.error("Error calling Gemini API: %s", e)
+                    raise
+                continue
+        
+        # If we get here, all models failed
+        raise self._all_models_failed(last_error)
     
-    def _list_available_models(self) -> list:
-        """List available models for this API key."""
-        try:
-            list_url = f"{GEMINI_API_BASE}/models"
-            response = requests.get(
-                list_url,
-                params={"key": self.api_key},
-                timeout=10
-            )
-            if response.status_code == 200:
-                data = response.json()
-                models = [m.get("name", "").replace("models/", "") for m in data.get("models", [])]
-                return models
-            return []
-        except Exception as e:
-            print(f"Error listing models: {e}")
-            return []
+    async def _ainvoke_uncached(self, prompt: str, temperature: float = 0.7, **kwargs) -> str:
+        """
+        Async variant of _invoke_uncached (retries + circuit breaker).
+        
+        Args:
+            prompt: Input prompt
+            temperature: Temperature for generation (0.0-1.0)
+            **kwargs: Additional parameters
+        
+        Returns:
+            Response text
+        
+        Raises:
+            CircuitOpen: if the circuit breaker is open
+        """
+        return await _acall_with_retries(
+            lambda: self._ainvoke_attempt(prompt, temperature, **kwargs))
     
-    def invoke(self, prompt: str, temperature: float = 0.7, **kwargs) -> str:
+    async def _ainvoke_attempt(self, prompt: str, temperature: float = 0.7, **kwargs) -> str:
         """
-        Invoke Gemini with prompt using REST API.
+        Single async attempt using the pooled httpx.AsyncClient.
         
         Args:
             prompt: Input prompt
@@ -113,103 +1237,53 @@ class GeminiService(LLMService):
         Returns:
             Response text
         """
-        # Try different model names if the default fails
-        # Updated to use Gemini 2.5/2.0 models (as of 2024)
-        models_to_try = [
-            "gemini-2.5-flash",      # Latest fast model
-            "gemini-2.0-flash",      # Alternative fast model
-            "gemini-2.5-pro",        # More capable model
-            "gemini-2.0-flash-001",  # Specific version
-            "gemini-1.5-flash-latest", # Fallback (may not exist)
-            "gemini-1.5-flash",      # Fallback
-            "gemini-pro"             # Fallback
-        ]
-        
-        # First, try to get available models if we haven't already
-        if not hasattr(self, '_available_models'):
-            print("[Gemini] Checking available models...")
-            available_models = self._list_available_models()
-            if available_models:
-                print(f"[Gemini] Available models: {', '.join(available_models[:5])}")
-                # Prefer models that are in our list
-                preferred = [m for m in models_to_try if m in available_models]
-                if preferred:
-                    models_to_try = preferred + [m for m in models_to_try if m not in preferred]
-            self._available_models = available_models
+        # Model discovery uses the blocking client - keep it off the event loop
+        if self._discovery_pending:
+            models_to_try = await asyncio.to_thread(self._candidate_models)
+        else:
+            models_to_try = self._candidate_models()
+        payload = self._build_payload(prompt, temperature, **kwargs)
+        return await self._agenerate(payload, models_to_try, self._api_base(kwargs))
+    
+    async def _agenerate(self, payload: Dict[str, Any], models_to_try: List[str], api_base: str) -> str:
+        """
+        Async variant of _generate.
+        
+        Args:
+            payload: Request body
+            models_to_try: Model names in preference order
+            api_base: API base URL (v1, or v1beta for JSON mode)
+        
+        Returns:
+            Response text
+        """
+        client = get_async_client()
+        # Serialized once, reused across the model fallback
+        body = _json_dumps(payload)
         
         last_error = None
         for model in models_to_try:
+            is_last = model == models_to_try[-1]
             try:
-                api_url = f"{GEMINI_API_BASE}/models/{model}:generateContent"
-                
-                payload = {
-                    "contents": [{
-                        "parts": [{
-                            "text": prompt
-                        }]
-                    }],
-                    "generationConfig": {
-                        "temperature": temperature,
-                        **kwargs
-                    }
-                }
+                api_url = model_url(api_base, model)
                 
-                response = requests.post(
+                response = await client.post(
                     api_url,
                     params={"key": self.api_key},
-                    json=payload,
+                    content=body,
+                    headers=JSON_HEADERS,
                     timeout=120
                 )
                 
-                if response.status_code == 200:
-                    result = response.json()
-                    if "candidates" in result and len(result["candidates"]) > 0:
-                        text = result["candidates"][0]["content"]["parts"][0]["text"]
-                        # Update model name if we used a different one
-                        if model != self.model_name:
-                            self.model_name = model
-                            self.api_url = api_url
-                        return text.strip()
-                    else:
-                        last_error = "No candidates in response"
-                        continue
-                elif response.status_code == 404:
-                    # Try next model
-                    error_data = response.json() if response.headers.get('content-type', '').startswith('application/json') else {}
-                    last_error = error_data.get("error", {}).get("message", f"Model {model} not found (404)")
-                    continue
-                elif response.status_code == 400:
-                    # Bad request - might be API key issue
-                    error_data = response.json() if response.headers.get('content-type', '').startswith('application/json') else {}
-                    error_msg = error_data.get("error", {}).get("message", response.text[:200])
-                    last_error = f"Bad request (400): {error_msg}"
-                    # Don't try other models if it's a bad request
-                    raise Exception(f"API Error 400: {error_msg}")
-                elif response.status_code == 401 or response.status_code == 403:
-                    # Authentication error - don't try other models
-                    error_data = response.json() if response.headers.get('content-type', '').startswith('application/json') else {}
-                    error_msg = error_data.get("error", {}).get("message", "Invalid API key or permission denied")
-                    raise Exception(f"Authentication Error ({response.status_code}): {error_msg}. Please check your GEMINI_API_KEY.")
-                elif response.status_code == 429:
-                    # Rate limit - try next model, but warn user
-                    error_data = response.json() if response.headers.get('content-type', '').startswith('application/json') else {}
-                    error_msg = error_data.get("error", {}).get("message", "Rate limit exceeded")
-                    last_error = f"Rate limit (429): {error_msg}"
-                    if model == models_to_try[-1]:
-                        raise Exception(f"Rate limit exceeded on all models. Please wait and try again, or check your quota at https://ai.dev/usage")
-                    continue
-                else:
-                    error_data = response.json() if response.headers.get('content-type', '').startswith('application/json') else {}
-                    error_msg = error_data.get("error", {}).get("message", response.text[:200])
-                    last_error = f"API Error {response.status_code}: {error_msg}"
-                    if model == models_to_try[-1]:
-                        raise Exception(last_error)
-                    continue
-                    
-            except requests.exceptions.RequestException as e:
+                return self._handle_response(response, model, api_url, is_last)
+            
+            except _TryNextModel as e:
+                last_error = str(e)
+                continue
+            except httpx.HTTPError as e:
                 last_error = f"Request exception: {str(e)}"
-                if model == models_to_try[-1]:
-                    print(f"Error calling Gemini API: {e}")
+                if is_last:
+                    logger.error("Error calling Gemini API: %s", e)
                     raise
                 continue
             except Exception as e:
@@ -217,49 +1291,71 @@ class GeminiService(LLMService):
                 if "Authentication" in str(e) or "400" in str(e):
                     raise
                 last_error = str(e)
-                if model == models_to_try[-1]:
-                    print(f"Error calling Gemini API: {e}")
+                if is_last:
+                    logger.error("Error calling Gemini API: %s", e)
                     raise
                 continue
         
         # If we get here, all models failed
-        error_msg = f"All model names failed. Last error: {last_error}"
-        if hasattr(self, '_available_models') and self._available_models:
-            error_msg += f"\nAvailable models: {', '.join(self._available_models[:10])}"
-        raise Exception(error_msg)
+        raise self._all_models_failed(last_error)
     
-    def invoke_json(self, prompt: str, temperature: float = 0.7, **kwargs) -> Dict[str, Any]:
+    def invoke_json(self, prompt: str, temperature: float = 0.7,
+                    max_tokens: Optional[int] = None,
+                    schema: Optional[Dict[str, Any]] = None, **kwargs) -> Dict[str, Any]:
         """
         Invoke Gemini and parse JSON response.
         
         Args:
             prompt: Input prompt (should request JSON output)
             temperature: Temperature for generation
+            max_tokens: Cap on output tokens (maxOutputTokens)
+            schema: Gemini response schema; enables JSON mode when given
             **kwargs: Additional parameters
         
         Returns:
             Parsed JSON dictionary
         """
+        kwargs = self._json_generation_config(kwargs, max_tokens, schema)
         response_text = self.invoke(prompt, temperature=temperature, **kwargs)
+        return _extract_json(response_text, self.provider)
+    
+    async def ainvoke_json(self, prompt: str, temperature: float = 0.7,
+                           max_tokens: Optional[int] = None,
+                           schema: Optional[Dict[str, Any]] = None, **kwargs) -> Dict[str, Any]:
+        """
+        Async variant of invoke_json.
         
-        # Try to extract JSON from response
-        try:
-            # Remove markdown code blocks if present
-            if "```json" in response_text:
-                response_text = response_text.split("```json")[1].split("```")[0].strip()
-            elif "```" in response_text:
-                response_text = response_text.split("```")[1].split("```")[0].strip()
-            
-            return json.loads(response_text)
-        except json.JSONDecodeError as e:
-            print(f"Error parsing JSON from Gemini: {e}")
-            print(f"Response text: {response_text[:200]}...")
-            raise
+        Args:
+            prompt: Input prompt (should request JSON output)
+            temperature: Temperature for generation
+            max_tokens: Cap on output tokens (maxOutputTokens)
+            schema: Gemini response schema; enables JSON mode when given
+            **kwargs: Additional parameters
+        
+        Returns:
+            Parsed JSON dictionary
+        """
+        kwargs = self._json_generation_config(kwargs, max_tokens, schema)
+        response_text = await self.ainvoke(prompt, temperature=temperature, **kwargs)
+        return _extract_json(response_text, self.provider)
+    
+    @staticmethod
+    def _json_generation_config(kwargs: Dict[str, Any], max_tokens: Optional[int],
+                                schema: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+        """Map max_tokens/schema onto their generationConfig fields."""
+        if max_tokens is not None:
+            kwargs["maxOutputTokens"] = max_tokens
+        if schema is not None:
+            kwargs["responseMimeType"] = "application/json"
+            kwargs["responseSchema"] = schema
+        return kwargs
 
 
 class HuggingFaceService(LLMService):
     """Hugging Face Inference API service."""
     
+    provider = "Hugging Face"
+    
     def __init__(self, api_key: Optional[str] = None, model: str = "mistralai/Mistral-7B-Instruct-v0.2"):
         """
         Initialize Hugging Face service.
@@ -275,6 +1371,8 @@ class HuggingFaceService(LLMService):
         if not self.api_key:
             raise ValueError("HUGGINGFACE_API_KEY not found in environment variables")
         
+        from huggingface_hub import InferenceClient
+        
         self.model_name = model
         self.client = InferenceClient(api_key=self.api_key)
     
@@ -308,7 +1406,7 @@ class HuggingFaceService(LLMService):
                 # Handle GeneratedText object
                 return str(response).strip()
         except Exception as e:
-            print(f"Error calling Hugging Face API: {e}")
+            logger.error("Error calling Hugging Face API: %s", e)
             # Try alternative API format
             try:
                 response = self.client.post(
@@ -322,16 +1420,56 @@ class HuggingFaceService(LLMService):
                     },
                     model=self.model_name
                 )
-                if isinstance(response, list) and len(response) > 0:
-                    result = response[0]
-                    if isinstance(result, dict):
-                        return result.get("generated_text", "").strip()
-                    return str(result).strip()
-                return str(response).strip()
+                return self._generated_text(response)
             except Exception as e2:
-                print(f"Alternative Hugging Face API call also failed: {e2}")
+                logger.error("Alternative Hugging Face API call also failed: %s", e2)
                 raise e
     
+    async def ainvoke(self, prompt: str, temperature: float = 0.3, **kwargs) -> str:
+        """
+        Async invoke over the shared httpx.AsyncClient (raw Inference API).
+        
+        Falls back to the threaded InferenceClient path if the raw
+        endpoint rejects the request.
+        
+        Args:
+            prompt: Input prompt
+            temperature: Temperature for generation (0.0-1.0)
+            **kwargs: Additional parameters
+        
+        Returns:
+            Response text
+        """
+        try:
+            response = await get_async_client().post(
+                f"{HF_API_BASE}/{self.model_name}",
+                headers={"Authorization": f"Bearer {self.api_key}"},
+                json={
+                    "inputs": prompt,
+                    "parameters": {
+                        "temperature": temperature,
+                        "max_new_tokens": 512,
+                        "return_full_text": False,
+                        **kwargs
+                    }
+                }
+            )
+            response.raise_for_status()
+            return self._generated_text(_json_loads(response.content))
+        except (httpx.HTTPError, ValueError) as e:
+            logger.warning("Async Hugging Face call failed (%s); using InferenceClient", e)
+            return await super().ainvoke(prompt, temperature=temperature, **kwargs)
+    
+    @staticmethod
+    def _generated_text(response: Any) -> str:
+        """Extract text from a raw Inference API text-generation response."""
+        if isinstance(response, list) and len(response) > 0:
+            result = response[0]
+            if isinstance(result, dict):
+                return result.get("generated_text", "").strip()
+            return str(result).strip()
+        return str(response).strip()
+    
     def invoke_json(self, prompt: str, temperature: float = 0.3, **kwargs) -> Dict[str, Any]:
         """
         Invoke Hugging Face and parse JSON response.
@@ -345,32 +1483,46 @@ class HuggingFaceService(LLMService):
             Parsed JSON dictionary
         """
         response_text = self.invoke(prompt, temperature=temperature, **kwargs)
-        
-        # Try to extract JSON from response
-        try:
-            # Remove markdown code blocks if present
-            if "```json" in response_text:
-                response_text = response_text.split("```json")[1].split("```")[0].strip()
-            elif "```" in response_text:
-                response_text = response_text.split("```")[1].split("```")[0].strip()
-            
-            return json.loads(response_text)
-        except json.JSONDecodeError as e:
-            print(f"Error parsing JSON from Hugging Face: {e}")
-            print(f"Response text: {response_text[:200]}...")
-            raise
+        return _extract_json(response_text, self.provider)
 
 
 # Global instances (lazy initialization)
 _gemini_service: Optional[GeminiService] = None
 _hf_service: Optional[HuggingFaceService] = None
+_service_lock = threading.Lock()
+# Construction errors (e.g. missing API key), remembered so later calls fail
+# fast without re-reading the environment
+_service_errors: Dict[str, Exception] = {}
+
+
+def _raise_cached_error(name: str) -> None:
+    """Re-raise a remembered construction error for service `name`, if any."""
+    error = _service_errors.get(name)
+    if error is not None:
+        raise error.with_traceback(None)
 
 
 def get_gemini_service() -> GeminiService:
-    """Get or create Gemini service instance."""
+    """
+    Get or create the Gemini service singleton.
+    
+    The first call also starts a background warmup (TLS connection),
+    so calling this early - before any agent runs - hides that latency.
+    """
     global _gemini_service
     if _gemini_service is None:
-        _gemini_service = GeminiService()
+        _raise_cached_error("gemini")
+        # Agents on worker threads may race here on the first request
+        with _service_lock:
+            if _gemini_service is None:
+                _raise_cached_error("gemini")
+                try:
+                    service = GeminiService()
+                except ValueError as e:
+                    _service_errors["gemini"] = e
+                    raise
+                service.warmup()
+                _gemini_service = service
     return _gemini_service
 
 
@@ -378,10 +1530,104 @@ def get_hf_service() -> HuggingFaceService:
     """Get or create Hugging Face service instance."""
     global _hf_service
     if _hf_service is None:
-        _hf_service = HuggingFaceService()
+        _raise_cached_error("hf")
+        try:
+            _hf_service = HuggingFaceService()
+        except (ImportError, ValueError) as e:
+            _service_errors["hf"] = e
+            raise
     return _hf_service
 
 
+_llm_semaphores: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, asyncio.Semaphore]" = weakref.WeakKeyDictionary()
+
+
+def get_llm_semaphore() -> asyncio.Semaphore:
+    """
+    Get the semaphore that gates concurrent LLM calls on the running event loop.
+    
+    Semaphores are bound to an event loop, so one is kept per loop
+    (each asyncio.run() call creates a fresh loop).
+    
+    Returns:
+        asyncio.Semaphore sized by GEMINI_CONCURRENCY
+    """
+    loop = asyncio.get_running_loop()
+    semaphore = _llm_semaphores.get(loop)
+    if semaphore is None:
+        semaphore = asyncio.Semaphore(GEMINI_CONCURRENCY)
+        _llm_semaphores[loop] = semaphore
+    return semaphore
+
+
+_async_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, httpx.AsyncClient]" = weakref.WeakKeyDictionary()
+
+
+def get_async_client() -> httpx.AsyncClient:
+    """
+    Get the pooled httpx.AsyncClient for the running event loop.
+    
+    Pooled connections are bound to the loop that opened them, so one
+    client is kept per loop and shared by every agent running on it.
+    
+    Returns:
+        httpx.AsyncClient with keep-alive pooling (HTTP/2 when available)
+    """
+    loop = asyncio.get_running_loop()
+    client = _async_clients.get(loop)
+    if client is None or client.is_closed:
+        client = httpx.AsyncClient(
+            http2=HTTP2_AVAILABLE,
+            limits=httpx.Limits(max_keepalive_connections=20, max_connections=100, keepalive_expiry=30),
+            timeout=120
+        )
+        _async_clients[loop] = client
+    return client
+
+
+async def aclose_async_client() -> None:
+    """Close the running loop's pooled httpx.AsyncClient, if one was opened."""
+    client = _async_clients.pop(asyncio.get_running_loop(), None)
+    if client is not None and not client.is_closed:
+        await client.aclose()
+
+
+def run_async(main: Awaitable[T]) -> T:
+    """
+    asyncio.run() that closes the loop's pooled httpx.AsyncClient on exit.
+    
+    asyncio.run() tears the loop down after main returns, so a client left
+    open would leak its sockets (and warn) once the loop is gone.
+    
+    Args:
+        main: Coroutine to run
+    
+    Returns:
+        The coroutine's result
+    """
+    async def _run() -> T:
+        try:
+            return await main
+        finally:
+            await aclose_async_client()
+    
+    return asyncio.run(_run())
+
+
+# Agent name (lowercased) -> service getter; names not listed are routed
+# by substring once and memoized here
+_AGENT_ROUTER: Dict[str, Any] = {
+    "macro_trends": get_hf_service,
+    "macro_trends_agent": get_hf_service,
+    "sentiment": get_hf_service,
+    "risk_agent": get_gemini_service,
+    "scenario_agent": get_gemini_service,
+    "memo_writer": get_gemini_service,
+    "memo_writer_agent": get_gemini_service,
+    "default": get_gemini_service,
+}
+
+
 def get_llm_for_agent(agent_name: str) -> LLMService:
     """
     Get appropriate LLM service for agent.
@@ -397,13 +1643,15 @@ def get_llm_for_agent(agent_name: str) -> LLMService:
         LLM service instance
     """
     agent_name_lower = agent_name.lower()
-    
-    # Macro Sentiment uses Hugging Face
-    if "macro" in agent_name_lower or "sentiment" in agent_name_lower:
-        return get_hf_service()
-    
-    # All other agents use Gemini
-    return get_gemini_service()
+    getter = _AGENT_ROUTER.get(agent_name_lower)
+    if getter is None:
+        # Macro Sentiment uses Hugging Face; all other agents use Gemini
+        if "macro" in agent_name_lower or "sentiment" in agent_name_lower:
+            getter = get_hf_service
+        else:
+            getter = get_gemini_service
+        _AGENT_ROUTER[agent_name_lower] = getter
+    return getter()
 
 
 # Compatibility wrapper for existing code
@@ -434,6 +1682,88 @@ class LLMWrapper:
         """
         response_text = self.llm_service.invoke(prompt, temperature=self.temperature)
         return LLMResponse(response_text)
+    
+    def stream(self, prompt: str) -> Iterator[str]:
+        """
+        Stream the response as text chunks.
+        
+        Args:
+            prompt: Input prompt
+        
+        Yields:
+            Response text chunks
+        """
+        yield from self.llm_service.stream(prompt, temperature=self.temperature)
+    
+    async def astream(self, prompt: str) -> AsyncIterator[str]:
+        """
+        Async variant of stream.
+        
+        Args:
+            prompt: Input prompt
+        
+        Yields:
+            Response text chunks
+        """
+        async for chunk in self.llm_service.astream(prompt, temperature=self.temperature):
+            yield chunk
+    
+    async def ainvoke(self, prompt: str) -> "LLMResponse":
+        """
+        Async variant of invoke.
+        
+        Args:
+            prompt: Input prompt
+        
+        Returns:
+            LLMResponse object with content attribute
+        """
+        response_text = await self.llm_service.ainvoke(prompt, temperature=self.temperature)
+        return LLMResponse(response_text)
+    
+    async def ainvoke_json(self, prompt: str) -> Dict[str, Any]:
+        """
+        Async invoke that parses a JSON response.
+        
+        Args:
+            prompt: Input prompt (should request JSON output)
+        
+        Returns:
+            Parsed JSON dictionary
+        """
+        return await self.llm_service.ainvoke_json(prompt, temperature=self.temperature)
+    
+    async def batch_ainvoke(self, prompts: List[str]) -> List["LLMResponse"]:
+        """
+        Invoke several prompts concurrently, gated by the shared LLM semaphore.
+        
+        Args:
+            prompts: Input prompts
+        
+        Returns:
+            LLMResponse objects in prompt order
+        """
+        semaphore = get_llm_semaphore()
+        
+        async def _one(prompt: str) -> "LLMResponse":
+            async with semaphore:
+                return await self.ainvoke(prompt)
+        
+        return await asyncio.gather(*(_one(prompt) for prompt in prompts))
+    
+    def batch_invoke(self, prompts: List[str]) -> List["LLMResponse"]:
+        """
+        Blocking batch_ainvoke for callers without an event loop.
+        
+        Must not be called from a running event loop (use batch_ainvoke).
+        
+        Args:
+            prompts: Input prompts
+        
+        Returns:
+            LLMResponse objects in prompt order
+        """
+        return asyncio.run(self.batch_ainvoke(prompts))
 
 
 class LLMResponse:
@@ -0,0 +1,70 @@
+"""
+Logger
+
+Shared "analyst" logger for agent progress output.
+
+Messages keep the "[Agent Name] ..." format on stdout, which the Node
+frontend parses for progress. Records are written without a per-line
+flush; the stream is flushed at agent boundaries (records logged with
+extra=FLUSH), on warnings/errors, and after every record when
+JSON_OUTPUT=true so streaming UIs still see progress in real time.
+"""
+
+import os
+import sys
+import logging
+
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+
+# Pass as extra= on the last message of an agent to flush buffered output
+FLUSH = {"flush": True}
+
+
+class BoundaryFlushHandler(logging.StreamHandler):
+    """StreamHandler that only flushes at agent boundaries."""
+
+    def __init__(self, stream=None, flush_each: bool = False):
+        """
+        Initialize handler.
+
+        Args:
+            stream: Output stream (defaults to sys.stdout)
+            flush_each: Flush after every record (streaming UIs)
+        """
+        super().__init__(stream if stream is not None else sys.stdout)
+        self.flush_each = flush_each
+
+    def emit(self, record: logging.LogRecord) -> None:
+        try:
+            self.stream.write(self.format(record) + self.terminator)
+            if self.flush_each or record.levelno >= logging.WARNING or getattr(record, "flush", False):
+                self.flush()
+        except RecursionError:
+            raise
+        except Exception:
+            self.handleError(record)
+
+
+logger = logging.getLogger("analyst")
+logger.setLevel(LOG_LEVEL)
+logger.propagate = False
+
+handler = BoundaryFlushHandler(flush_each=os.getenv("JSON_OUTPUT") == "true")
+handler.setFormatter(logging.Formatter("%(message)s"))
+logger.addHandler(handler)
+
+
+def configure_logging(stream=None, level: str = LOG_LEVEL) -> logging.Logger:
+    """
+    Point the analyst logger at a stream (e.g. after replacing sys.stdout).
+
+    Args:
+        stream: Output stream (defaults to sys.stdout)
+        level: Log level name
+
+    Returns:
+        The configured logger
+    """
+    handler.setStream(stream if stream is not None else sys.stdout)
+    logger.setLevel(level)
+    return logger
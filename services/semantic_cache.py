@@ -0,0 +1,49 @@
+"""
+Semantic Cache
+
+Prompt embeddings for the semantic layer of the LLM response cache
+(GenerativeCache in services.llm_service). Prompts are embedded with
+all-MiniLM-L6-v2, which needs sentence-transformers (optional).
+"""
+
+import threading
+from typing import Any
+
+try:
+    import numpy as np
+    from sentence_transformers import SentenceTransformer
+    SEMANTIC_CACHE_AVAILABLE = True
+except ImportError:
+    SEMANTIC_CACHE_AVAILABLE = False
+
+EMBEDDING_MODEL = "all-MiniLM-L6-v2"
+EMBEDDING_DIM = 384
+# Stored embeddings are kept as float16 (half the memory of float32; the
+# cosine-similarity error is far below any useful threshold). Queries are
+# computed in float32.
+STORAGE_DTYPE = "float16"
+
+_encoder = None
+_encoder_lock = threading.Lock()
+
+
+def embed(text: str) -> Any:
+    """
+    Embed text as a unit-norm float32 vector.
+
+    The encoder is loaded once per process and shared by all caches.
+
+    Args:
+        text: Text to embed
+
+    Returns:
+        numpy vector, or None if sentence-transformers is unavailable
+    """
+    global _encoder
+    if not SEMANTIC_CACHE_AVAILABLE:
+        return None
+    if _encoder is None:
+        with _encoder_lock:
+            if _encoder is None:
+                _encoder = SentenceTransformer(EMBEDDING_MODEL)
+    return np.asarray(_encoder.encode(text, normalize_embeddings=True), dtype=np.float32)
@@ -0,0 +1,33 @@
+"""
+Optional Numba JIT
+
+njit compiles small NumPy kernels with Numba when it is installed and
+returns them unchanged otherwise, so callers never need to check.
+"""
+
+from typing import Any, Callable
+
+# Try to import Numba, but make it optional
+try:
+    from numba import njit as _numba_njit
+    NUMBA_AVAILABLE = True
+except ImportError:
+    NUMBA_AVAILABLE = False
+
+# fastmath flags that keep NaN/inf semantics (the kernels rely on np.isnan)
+FASTMATH = {"reassoc", "contract", "arcp"}
+
+
+def njit(func: Callable[..., Any]) -> Callable[..., Any]:
+    """
+    JIT-compile a kernel with Numba (on-disk cached), or return it as is.
+
+    Args:
+        func: Function using only Numba-supported NumPy operations
+
+    Returns:
+        Compiled dispatcher, or func when Numba is unavailable
+    """
+    if not NUMBA_AVAILABLE:
+        return func
+    return _numba_njit(cache=True, fastmath=FASTMATH)(func)
@@ -0,0 +1,154 @@
+"""
+File Cache
+
+Persistent on-disk TTL cache for data-fetching tools.
+Entries live under .cache/{name}/{key}.json as {"ts": ..., "value": ...}.
+"""
+
+import os
+import json
+import time
+import hashlib
+import asyncio
+import tempfile
+from datetime import datetime, timezone
+from functools import wraps
+from typing import Any, Callable, Optional
+from services.logger import logger
+
+CACHE_DIR = os.getenv("CACHE_DIR", ".cache")
+
+# Dev override: force one TTL (in seconds) for every cached tool; 0 disables caching
+CACHE_TTL_OVERRIDE = os.getenv("CACHE_TTL_OVERRIDE")
+
+_MISS = object()
+
+
+class FileCache:
+    """JSON file cache with per-entry timestamps and atomic writes."""
+
+    def __init__(self, name: str, ttl: float, base_dir: str = CACHE_DIR):
+        """
+        Initialize file cache.
+
+        Args:
+            name: Cache namespace (subdirectory name)
+            ttl: Time-to-live in seconds
+            base_dir: Root cache directory
+        """
+        self.name = name
+        self.ttl = ttl
+        self.directory = os.path.join(base_dir, name)
+
+    @staticmethod
+    def make_key(*args, **kwargs) -> str:
+        """Build a stable cache key from call arguments."""
+        payload = json.dumps({"args": args, "kwargs": kwargs}, sort_keys=True, default=str)
+        return hashlib.md5(payload.encode("utf-8")).hexdigest()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}.json")
+
+    def get(self, key: str) -> Any:
+        """
+        Read a cached value.
+
+        Args:
+            key: Cache key
+
+        Returns:
+            Cached value, or the _MISS sentinel if absent/expired/corrupt
+        """
+        try:
+            with open(self._path(key), "r", encoding="utf-8") as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            return _MISS
+
+        if time.time() - entry.get("ts", 0) > self.ttl:
+            return _MISS
+        return entry.get("value", _MISS)
+
+    def set(self, key: str, value: Any) -> None:
+        """
+        Write a value atomically (temp file + os.replace).
+
+        Args:
+            key: Cache key
+            value: JSON-serializable value
+        """
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+            try:
+                with os.fdopen(fd, "w", encoding="utf-8") as f:
+                    json.dump({"ts": time.time(), "value": value}, f)
+                os.replace(tmp_path, self._path(key))
+            except BaseException:
+                os.unlink(tmp_path)
+                raise
+        except (OSError, TypeError, ValueError) as e:
+            # Caching is best-effort - never fail the tool call
+            logger.warning("[Cache] Could not write %s entry: %s", self.name, e)
+
+
+def cached(ttl: float, name: Optional[str] = None,
+           cache_if: Optional[Callable[[Any], bool]] = None,
+           daily: bool = False) -> Callable:
+    """
+    Decorator caching a tool's return value on disk for `ttl` seconds.
+
+    Works for both sync and async functions; sync/async twins can share
+    entries by passing the same `name`.
+
+    Args:
+        ttl: Time-to-live in seconds (overridden by CACHE_TTL_OVERRIDE)
+        name: Cache namespace (defaults to the function name)
+        cache_if: Predicate on the result; failed fetches should not be cached
+        daily: Also key entries on the UTC date, so they roll over at midnight
+               even if the TTL has not expired (for daily-updated sources)
+
+    Returns:
+        Decorator
+    """
+    if CACHE_TTL_OVERRIDE is not None:
+        ttl = float(CACHE_TTL_OVERRIDE)
+
+    def decorator(func: Callable) -> Callable:
+        cache = FileCache(name or func.__name__, ttl)
+        
+        def make_key(args, kwargs) -> str:
+            if daily:
+                kwargs = {**kwargs, "_date": datetime.now(timezone.utc).strftime("%Y-%m-%d")}
+            return cache.make_key(*args, **kwargs)
+
+        if asyncio.iscoroutinefunction(func):
+            @wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                if cache.ttl <= 0:
+                    return await func(*args, **kwargs)
+                key = make_key(args, kwargs)
+                value = cache.get(key)
+                if value is _MISS:
+                    value = await func(*args, **kwargs)
+                    if cache_if is None or cache_if(value):
+                        cache.set(key, value)
+                return value
+            async_wrapper.cache = cache
+            return async_wrapper
+
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            if cache.ttl <= 0:
+                return func(*args, **kwargs)
+            key = make_key(args, kwargs)
+            value = cache.get(key)
+            if value is _MISS:
+                value = func(*args, **kwargs)
+                if cache_if is None or cache_if(value):
+                    cache.set(key, value)
+            return value
+        wrapper.cache = cache
+        return wrapper
+
+    return decorator
@@ -0,0 +1,127 @@
+"""
+Technical Indicators
+
+Latest-value technical indicators computed from a close-price array:
+RSI (Wilder), SMA 50/200, MACD (12/26/9) and Bollinger Bands (20, 2σ).
+Uses TA-Lib (C) when installed; otherwise NumPy kernels with the same
+definitions (EMA/RSI seeded with a simple average, population stdev),
+JIT-compiled when Numba is installed.
+"""
+
+import numpy as np
+from typing import Dict, Optional
+from tools._njit import njit
+
+# Try to import TA-Lib, but make it optional
+try:
+    import talib
+    TALIB_AVAILABLE = True
+except ImportError:
+    TALIB_AVAILABLE = False
+    talib = None
+
+RSI_PERIOD = 14
+SMA_PERIODS = (50, 200)
+MACD_PERIODS = (12, 26, 9)
+BBANDS_PERIOD = 20
+BBANDS_STDEV = 2.0
+
+
+def _last(values: np.ndarray) -> Optional[float]:
+    """Last value of an indicator series, or None if it is NaN/empty."""
+    if values.size == 0 or np.isnan(values[-1]):
+        return None
+    return float(values[-1])
+
+
+@njit
+def _ema_loop(values: np.ndarray, period: int) -> np.ndarray:
+    """EMA seeded with the simple average of the first `period` values."""
+    out = np.empty(values.size - period + 1)
+    alpha = 2.0 / (period + 1)
+    ema = values[:period].mean()
+    out[0] = ema
+    for i in range(period, values.size):
+        ema += alpha * (values[i] - ema)
+        out[i - period + 1] = ema
+    return out
+
+
+@njit
+def _rsi_loop(close: np.ndarray, period: int) -> float:
+    """Last Wilder RSI (averages seeded with the first `period` changes)."""
+    deltas = np.diff(close)
+    gains = np.maximum(deltas, 0.0)
+    losses = np.maximum(-deltas, 0.0)
+    avg_gain = gains[:period].mean()
+    avg_loss = losses[:period].mean()
+    for i in range(period, deltas.size):
+        avg_gain = (avg_gain * (period - 1) + gains[i]) / period
+        avg_loss = (avg_loss * (period - 1) + losses[i]) / period
+    if avg_loss == 0:
+        return 100.0
+    return 100.0 - 100.0 / (1.0 + avg_gain / avg_loss)
+
+
+@njit
+def _macd_loop(close: np.ndarray, fast: int, slow: int, signal: int) -> np.ndarray:
+    """Last (MACD line, signal line)."""
+    # Start the fast EMA where the slow one starts so the lines align
+    fast_ema = _ema_loop(close[slow - fast:], fast)
+    slow_ema = _ema_loop(close, slow)
+    macd_line = fast_ema - slow_ema
+    signal_line = _ema_loop(macd_line, signal)
+    return np.array([macd_line[-1], signal_line[-1]])
+
+
+def compute_indicators(close: np.ndarray) -> Dict[str, Optional[float]]:
+    """
+    Compute the latest indicator values from closes in date order.
+
+    Args:
+        close: Close prices (float64, NaN-free)
+
+    Returns:
+        Dictionary with rsi, sma_50, sma_200, macd, macd_signal, bb_upper
+        and bb_lower; each is None when there is not enough history
+    """
+    n = close.size
+    fast, slow, signal = MACD_PERIODS
+    indicators: Dict[str, Optional[float]] = {
+        "rsi": None, "sma_50": None, "sma_200": None,
+        "macd": None, "macd_signal": None, "bb_upper": None, "bb_lower": None,
+    }
+
+    if TALIB_AVAILABLE:
+        if n > RSI_PERIOD:
+            indicators["rsi"] = _last(talib.RSI(close, timeperiod=RSI_PERIOD))
+        for period in SMA_PERIODS:
+            if n >= period:
+                indicators[f"sma_{period}"] = _last(talib.SMA(close, timeperiod=period))
+        if n >= slow + signal - 1:
+            macd_line, signal_line, _ = talib.MACD(close, fastperiod=fast, slowperiod=slow, signalperiod=signal)
+            indicators["macd"] = _last(macd_line)
+            indicators["macd_signal"] = _last(signal_line)
+        if n >= BBANDS_PERIOD:
+            upper, _, lower = talib.BBANDS(close, timeperiod=BBANDS_PERIOD,
+                                           nbdevup=BBANDS_STDEV, nbdevdn=BBANDS_STDEV)
+            indicators["bb_upper"] = _last(upper)
+            indicators["bb_lower"] = _last(lower)
+        return indicators
+
+    if n > RSI_PERIOD:
+        indicators["rsi"] = float(_rsi_loop(close, RSI_PERIOD))
+    for period in SMA_PERIODS:
+        if n >= period:
+            indicators[f"sma_{period}"] = float(close[-period:].mean())
+    if n >= slow + signal - 1:
+        macd_line, signal_line = _macd_loop(close, fast, slow, signal)
+        indicators["macd"] = float(macd_line)
+        indicators["macd_signal"] = float(signal_line)
+    if n >= BBANDS_PERIOD:
+        window = close[-BBANDS_PERIOD:]
+        middle = window.mean()
+        width = BBANDS_STDEV * window.std()
+        indicators["bb_upper"] = float(middle + width)
+        indicators["bb_lower"] = float(middle - width)
+    return indicators
@@ -7,20 +7,91 @@ Functions for fetching macroeconomic data:
 - News sentiment
 """
 
-import yfinance as yf
-import pandas as pd
-from typing import Dict, Any, Optional
-from fredapi import Fred
+from typing import Dict, Any, Optional, TYPE_CHECKING
+import asyncio
 import os
+from concurrent.futures import ThreadPoolExecutor
 from dotenv import load_dotenv
+from services.logger import logger
+from tools.cache import cached
+
+# yfinance, pandas and fredapi are imported inside the fetch functions:
+# they are slow to import and cache hits never need them
+if TYPE_CHECKING:
+    from fredapi import Fred
 
 load_dotenv()
 
+# Cache TTL for macro data (FRED series and 6-month sector returns move slowly)
+MACRO_DATA_TTL = 24 * 60 * 60
+
+# Key sector ETFs
+SECTOR_ETFS = {
+    "XLK": "Technology",
+    "XLF": "Financials",
+    "XLV": "Healthcare",
+    "XLE": "Energy",
+    "XLI": "Industrials",
+    "XLP": "Consumer Staples",
+    "XLY": "Consumer Discretionary",
+    "XLB": "Materials",
+    "XLU": "Utilities",
+    "XLRE": "Real Estate",
+    "XLC": "Communication Services"
+}
+
 
+def _interest_rate_trend(fred: "Fred") -> str:
+    """Classify the Federal Funds Rate (FEDFUNDS) trend."""
+    try:
+        fed_funds = fred.get_series("FEDFUNDS", observation_start="2023-01-01")
+        if fed_funds is not None and len(fed_funds) > 1:
+            # Index the underlying array - skips pandas' indexer per scalar
+            rates = fed_funds.to_numpy()
+            recent_rate = rates[-1]
+            older_rate = rates[0] if len(rates) > 6 else rates[-1]
+            
+            if recent_rate > older_rate * 1.01:
+                return "Rising"
+            elif recent_rate < older_rate * 0.99:
+                return "Falling"
+            else:
+                return "Stable"
+        return "Unknown"
+    except Exception:
+        return "Unknown"
+
+
+def _inflation_trend(fred: "Fred") -> str:
+    """Classify YoY inflation from the Consumer Price Index (CPIAUCSL)."""
+    try:
+        cpi = fred.get_series("CPIAUCSL", observation_start="2023-01-01")
+        if cpi is not None and len(cpi) > 1:
+            # Calculate YoY inflation
+            values = cpi.to_numpy()
+            recent_cpi = values[-1]
+            year_ago_cpi = values[-12] if len(values) >= 12 else values[0]
+            inflation_rate = ((recent_cpi - year_ago_cpi) / year_ago_cpi) * 100
+            
+            if inflation_rate > 3:
+                return "Elevated"
+            elif inflation_rate < 2:
+                return "Cooling"
+            else:
+                return "Moderate"
+        return "Unknown"
+    except Exception:
+        return "Unknown"
+
+
+@cached(ttl=MACRO_DATA_TTL, daily=True, cache_if=lambda v: "error" not in v)
 def get_fred_data() -> Dict[str, Any]:
     """
     Fetch macroeconomic data from FRED API.
     
+    The two series are independent requests, so they are fetched
+    concurrently.
+    
     Returns:
         Dictionary with macro indicators
     """
@@ -33,52 +104,21 @@ def get_fred_data() -> Dict[str, Any]:
                 "error": "FRED_API_KEY not found in environment"
             }
         
+        from fredapi import Fred
         fred = Fred(api_key=api_key)
         
-        # Federal Funds Rate (FEDFUNDS)
-        try:
-            fed_funds = fred.get_series("FEDFUNDS", observation_start="2023-01-01")
-            if fed_funds is not None and len(fed_funds) > 1:
-                recent_rate = fed_funds.iloc[-1]
-                older_rate = fed_funds.iloc[0] if len(fed_funds) > 6 else fed_funds.iloc[-1]
-                
-                if recent_rate > older_rate * 1.01:
-                    interest_trend = "Rising"
-                elif recent_rate < older_rate * 0.99:
-                    interest_trend = "Falling"
-                else:
-                    interest_trend = "Stable"
-            else:
-                interest_trend = "Unknown"
-        except Exception:
-            interest_trend = "Unknown"
-        
-        # CPI (Consumer Price Index)
-        try:
-            cpi = fred.get_series("CPIAUCSL", observation_start="2023-01-01")
-            if cpi is not None and len(cpi) > 1:
-                # Calculate YoY inflation
-                recent_cpi = cpi.iloc[-1]
-                year_ago_cpi = cpi.iloc[-12] if len(cpi) >= 12 else cpi.iloc[0]
-                inflation_rate = ((recent_cpi - year_ago_cpi) / year_ago_cpi) * 100
-                
-                if inflation_rate > 3:
-                    inflation_trend = "Elevated"
-                elif inflation_rate < 2:
-                    inflation_trend = "Cooling"
-                else:
-                    inflation_trend = "Moderate"
-            else:
-                inflation_trend = "Unknown"
-        except Exception:
-            inflation_trend = "Unknown"
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            interest_future = executor.submit(_interest_rate_trend, fred)
+            inflation_future = executor.submit(_inflation_trend, fred)
+            interest_trend = interest_future.result()
+            inflation_trend = inflation_future.result()
         
         return {
             "interest_rate_trend": interest_trend,
             "inflation_trend": inflation_trend,
         }
     except Exception as e:
-        print(f"Error fetching FRED data: {e}")
+        logger.error("Error fetching FRED data: %s", e)
         return {
             "interest_rate_trend": "Unknown",
             "inflation_trend": "Unknown",
@@ -86,6 +126,7 @@ def get_fred_data() -> Dict[str, Any]:
         }
 
 
+@cached(ttl=MACRO_DATA_TTL, daily=True, cache_if=lambda v: bool(v.get("sector_performance")))
 def get_sector_performance() -> Dict[str, Any]:
     """
     Compare sector ETF performance.
@@ -94,39 +135,38 @@ def get_sector_performance() -> Dict[str, Any]:
         Dictionary with sector performance data
     """
     try:
-        # Key sector ETFs
-        sectors = {
-            "XLK": "Technology",
-            "XLF": "Financials",
-            "XLV": "Healthcare",
-            "XLE": "Energy",
-            "XLI": "Industrials",
-            "XLP": "Consumer Staples",
-            "XLY": "Consumer Discretionary",
-            "XLB": "Materials",
-            "XLU": "Utilities",
-            "XLRE": "Real Estate",
-            "XLC": "Communication Services"
-        }
+        import yfinance as yf
+        import pandas as pd
         
-        sector_performance = {}
+        # One batched request for all sector ETFs instead of one per ticker
+        data = yf.download(
+            list(SECTOR_ETFS),
+            period="6mo",
+            group_by="ticker",
+            auto_adjust=True,
+            progress=False,
+            threads=True
+        )
         
-        for etf, name in sectors.items():
-            try:
-                ticker = yf.Ticker(etf)
-                data = ticker.history(period="6mo")
-                
-                if data is not None and not data.empty and len(data) > 1:
-                    start_price = data["Close"].iloc[0]
-                    end_price = data["Close"].iloc[-1]
-                    return_pct = ((end_price - start_price) / start_price) * 100
-                    sector_performance[name] = round(return_pct, 2)
-            except Exception:
-                continue
+        returns = pd.Series(dtype=float)
+        if data is not None and not data.empty and len(data) > 1:
+            closes = data.xs("Close", level=1, axis=1)
+            # Return per ETF from its first/last valid close (tolerates gaps
+            # in single columns), as one vectorized pass over all columns
+            returns = (
+                closes.ffill().iloc[-1]
+                .div(closes.bfill().iloc[0])
+                .sub(1)
+                .mul(100)
+                .reindex(list(SECTOR_ETFS))
+                .dropna()
+                .round(2)
+            )
+        sector_performance = returns.rename(SECTOR_ETFS).to_dict()
         
         # Determine overall market trend
-        if sector_performance:
-            avg_performance = sum(sector_performance.values()) / len(sector_performance)
+        if not returns.empty:
+            avg_performance = returns.mean()
             if avg_performance > 5:
                 market_trend = "Strong"
             elif avg_performance > 0:
@@ -144,10 +184,20 @@ def get_sector_performance() -> Dict[str, Any]:
             "sector_performance_summary": market_trend
         }
     except Exception as e:
-        print(f"Error fetching sector performance: {e}")
+        logger.error("Error fetching sector performance: %s", e)
         return {"sector_performance": {}, "market_trend": "Unknown"}
 
 
+def _build_macro_data(fred_data: Dict[str, Any], sector_data: Dict[str, Any]) -> Dict[str, Any]:
+    """Merge FRED and sector results into the macro_data dict."""
+    return {
+        **fred_data,
+        **sector_data,
+        "news_sentiment": "Neutral-positive"  # Placeholder - can be enhanced with actual news API
+    }
+
+
+@cached(ttl=MACRO_DATA_TTL, name="macro_data", daily=True, cache_if=lambda v: "error" not in v)
 def get_macro_data() -> Dict[str, Any]:
     """
     Get comprehensive macroeconomic data.
@@ -155,13 +205,30 @@ def get_macro_data() -> Dict[str, Any]:
     Returns:
         Dictionary with all macro indicators
     """
-    fred_data = get_fred_data()
-    sector_data = get_sector_performance()
+    # FRED and Yahoo are separate hosts - fetch both concurrently
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        fred_future = executor.submit(get_fred_data)
+        sector_future = executor.submit(get_sector_performance)
+        fred_data = fred_future.result()
+        sector_data = sector_future.result()
     
-    macro_data = {
-        **fred_data,
-        **sector_data,
-        "news_sentiment": "Neutral-positive"  # Placeholder - can be enhanced with actual news API
-    }
+    return _build_macro_data(fred_data, sector_data)
+
+
+@cached(ttl=MACRO_DATA_TTL, name="macro_data", daily=True, cache_if=lambda v: "error" not in v)
+async def get_macro_data_async() -> Dict[str, Any]:
+    """
+    Async variant of get_macro_data.
+    
+    FRED and Yahoo are separate hosts, so both fetches run concurrently
+    on worker threads (fredapi/yfinance are blocking clients).
+    
+    Returns:
+        Dictionary with all macro indicators
+    """
+    fred_data, sector_data = await asyncio.gather(
+        asyncio.to_thread(get_fred_data),
+        asyncio.to_thread(get_sector_performance),
+    )
     
-    return macro_data
+    return _build_macro_data(fred_data, sector_data)
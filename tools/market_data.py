@@ -7,47 +7,23 @@ Functions for fetching and processing market data:
 - Technical indicators (RSI, moving averages)
 """
 
-import yfinance as yf
 import pandas as pd
-from typing import Dict, Any, Optional
-import signal
+import numpy as np
+from typing import Dict, Any, Optional, Tuple
+import asyncio
 import time
-from functools import wraps
+from concurrent.futures import ThreadPoolExecutor
+from services.logger import logger
+from tools.cache import cached
+from tools.indicators import compute_indicators
+from tools.price_history import get_history, get_histories, get_info, get_fast_info, BENCHMARK
 
-# Try to import pandas_ta, but make it optional
-try:
-    import pandas_ta as ta
-    PANDAS_TA_AVAILABLE = True
-except ImportError:
-    PANDAS_TA_AVAILABLE = False
-    ta = None
+# Cache TTL for market data (prices move intraday)
+MARKET_DATA_TTL = 15 * 60
 
 
-def timeout_handler(signum, frame):
-    raise TimeoutError("Operation timed out")
-
-
-def with_timeout(seconds=30):
-    """Decorator to add timeout to functions (Unix only)"""
-    def decorator(func):
-        @wraps(func)
-        def wrapper(*args, **kwargs):
-            if hasattr(signal, 'SIGALRM'):  # Unix only
-                signal.signal(signal.SIGALRM, timeout_handler)
-                signal.alarm(seconds)
-                try:
-                    result = func(*args, **kwargs)
-                finally:
-                    signal.alarm(0)
-                return result
-            else:
-                # Windows - just run without timeout
-                return func(*args, **kwargs)
-        return wrapper
-    return decorator
-
-
-def fetch_stock_data(ticker: str, period: str = "6mo") -> Optional[pd.DataFrame]:
+def fetch_stock_data(ticker: str, period: str = "6mo",
+                     also: Tuple[str, ...] = ()) -> Optional[pd.DataFrame]:
     """
     Fetch historical stock data using yfinance.
     Using shorter period (6mo) to speed up.
@@ -55,31 +31,35 @@ def fetch_stock_data(ticker: str, period: str = "6mo") -> Optional[pd.DataFrame]
     Args:
         ticker: Stock ticker symbol
         period: Time period (default: 6mo for faster fetching)
+        also: Extra tickers to download in the same batched request
+              (e.g. the beta benchmark), memoized for later tools
     
     Returns:
         DataFrame with OHLCV data or None if error
     """
     start_time = time.time()
     try:
-        print(f"  Fetching price data for {ticker} (period: {period})...")
-        print(f"  [Note: This may take 15-30 seconds. If it hangs, press Ctrl+C]")
+        logger.info("  Fetching price data for %s (period: %s)...", ticker, period)
+        logger.info("  [Note: This may take 15-30 seconds. If it hangs, press Ctrl+C]")
         
-        stock = yf.Ticker(ticker)
-        # Use shorter period and add progress indication
-        data = stock.history(period=period)
+        # Shared with the risk metrics tool, which reads the same history
+        if also:
+            data = get_histories([ticker, *also], period).get(ticker)
+        else:
+            data = get_history(ticker, period)
         
         elapsed = time.time() - start_time
         if data is not None and not data.empty:
-            print(f"  [OK] Fetched {len(data)} days of data in {elapsed:.1f}s")
+            logger.info("  [OK] Fetched %s days of data in %.1fs", len(data), elapsed)
         else:
-            print(f"  [WARNING] No data returned after {elapsed:.1f}s")
+            logger.warning("  [WARNING] No data returned after %.1fs", elapsed)
         return data
     except KeyboardInterrupt:
-        print(f"  [CANCELLED] User interrupted after {time.time() - start_time:.1f}s")
+        logger.warning("  [CANCELLED] User interrupted after %.1fs", time.time() - start_time)
         return None
     except Exception as e:
         elapsed = time.time() - start_time
-        print(f"  [ERROR] Error fetching data for {ticker} after {elapsed:.1f}s: {e}")
+        logger.error("  [ERROR] Error fetching data for %s after %.1fs: %s", ticker, elapsed, e)
         return None
 
 
@@ -95,11 +75,18 @@ def get_valuation_metrics(ticker: str) -> Dict[str, Any]:
     """
     start_time = time.time()
     try:
-        print(f"  Fetching valuation metrics for {ticker}...")
-        print(f"  [Note: This may take 15-30 seconds. If it hangs, press Ctrl+C]")
+        logger.info("  Fetching valuation metrics for %s...", ticker)
+        logger.info("  [Note: This may take 15-30 seconds. If it hangs, press Ctrl+C]")
         
-        stock = yf.Ticker(ticker)
-        info = stock.info
+        # The ratios only exist in the slow .info payload: start it on a
+        # worker thread and read the price fields from fast_info meanwhile
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            info_future = executor.submit(get_info, ticker)
+            try:
+                fast = get_fast_info(ticker)
+            except Exception:
+                fast = {}
+            info = info_future.result()
         
         metrics = {
             "pe_ratio": info.get("trailingPE", None),
@@ -108,19 +95,19 @@ def get_valuation_metrics(ticker: str) -> Dict[str, Any]:
             "ps_ratio": info.get("priceToSalesTrailing12Months", None),
             "peg_ratio": info.get("pegRatio", None),
             "dividend_yield": info.get("dividendYield", None),
-            "market_cap": info.get("marketCap", None),
+            "market_cap": fast.get("market_cap") or info.get("marketCap", None),
             "enterprise_value": info.get("enterpriseValue", None),
-            "current_price": info.get("currentPrice", None),
-            "52_week_high": info.get("fiftyTwoWeekHigh", None),
-            "52_week_low": info.get("fiftyTwoWeekLow", None),
+            "current_price": fast.get("current_price") or info.get("currentPrice", None),
+            "52_week_high": fast.get("52_week_high") or info.get("fiftyTwoWeekHigh", None),
+            "52_week_low": fast.get("52_week_low") or info.get("fiftyTwoWeekLow", None),
         }
         
         elapsed = time.time() - start_time
-        print(f"  [OK] Valuation metrics retrieved in {elapsed:.1f}s")
+        logger.info("  [OK] Valuation metrics retrieved in %.1fs", elapsed)
         return metrics
     except Exception as e:
         elapsed = time.time() - start_time
-        print(f"  [ERROR] Error fetching valuation metrics for {ticker} after {elapsed:.1f}s: {e}")
+        logger.error("  [ERROR] Error fetching valuation metrics for %s after %.1fs: %s", ticker, elapsed, e)
         return {}
 
 
@@ -138,50 +125,26 @@ def calculate_technical_indicators(data: pd.DataFrame) -> Dict[str, Any]:
         return {}
     
     try:
-        current_price = data["Close"].iloc[-1]
+        # One float64 array shared by every indicator (TA-Lib or NumPy)
+        close = data["Close"].to_numpy(dtype=np.float64)
+        close = close[~np.isnan(close)]
+        current_price = float(close[-1])
         
-        if PANDAS_TA_AVAILABLE and ta is not None:
-            # Calculate RSI
-            rsi = ta.rsi(data["Close"], length=14)
-            current_rsi = rsi.iloc[-1] if not rsi.empty else None
-            
-            # Calculate moving averages
-            sma_50 = ta.sma(data["Close"], length=50)
-            sma_200 = ta.sma(data["Close"], length=200)
-            
-            sma_50_current = sma_50.iloc[-1] if not sma_50.empty else None
-            sma_200_current = sma_200.iloc[-1] if not sma_200.empty else None
-            
-            # Calculate MACD
-            macd = ta.macd(data["Close"])
-            macd_signal = None
-            if macd is not None and not macd.empty:
-                macd_line = macd.iloc[:, 0] if len(macd.columns) > 0 else None
-                signal_line = macd.iloc[:, 2] if len(macd.columns) > 2 else None
-                if macd_line is not None and signal_line is not None:
-                    if macd_line.iloc[-1] > signal_line.iloc[-1]:
-                        macd_signal = "Bullish"
-                    else:
-                        macd_signal = "Bearish"
-            
-            # Calculate Bollinger Bands
-            bbands = ta.bbands(data["Close"], length=20)
-            bbands_signal = None
-            if bbands is not None and not bbands.empty:
-                upper = bbands.iloc[:, 0] if len(bbands.columns) > 0 else None
-                lower = bbands.iloc[:, 2] if len(bbands.columns) > 2 else None
-                if upper is not None and lower is not None:
-                    if current_price > upper.iloc[-1]:
-                        bbands_signal = "Overbought"
-                    elif current_price < lower.iloc[-1]:
-                        bbands_signal = "Oversold"
-        else:
-            # Fallback: Use pandas for simple calculations
-            current_rsi = None
-            sma_50_current = data["Close"].rolling(window=50).mean().iloc[-1] if len(data) >= 50 else None
-            sma_200_current = data["Close"].rolling(window=200).mean().iloc[-1] if len(data) >= 200 else None
-            macd_signal = None
-            bbands_signal = None
+        values = compute_indicators(close)
+        current_rsi = values["rsi"]
+        sma_50_current = values["sma_50"]
+        sma_200_current = values["sma_200"]
+        
+        macd_signal = None
+        if values["macd"] is not None and values["macd_signal"] is not None:
+            macd_signal = "Bullish" if values["macd"] > values["macd_signal"] else "Bearish"
+        
+        bbands_signal = None
+        if values["bb_upper"] is not None and values["bb_lower"] is not None:
+            if current_price > values["bb_upper"]:
+                bbands_signal = "Overbought"
+            elif current_price < values["bb_lower"]:
+                bbands_signal = "Oversold"
         
         # Determine MA signal
         ma_signal = "Neutral"
@@ -191,19 +154,28 @@ def calculate_technical_indicators(data: pd.DataFrame) -> Dict[str, Any]:
             elif current_price < sma_50_current < sma_200_current:
                 ma_signal = "Bearish"
         
+        # Round the reported values in one ufunc call (None -> NaN -> None)
+        rounded = np.round(np.array(
+            [current_rsi, sma_50_current, sma_200_current, current_price],
+            dtype=np.float64
+        ), 2)
+        rsi, sma_50, sma_200, price = [
+            None if np.isnan(value) else value for value in rounded.tolist()
+        ]
+        
         indicators = {
-            "rsi": round(current_rsi, 2) if current_rsi is not None else None,
-            "sma_50": round(sma_50_current, 2) if sma_50_current is not None else None,
-            "sma_200": round(sma_200_current, 2) if sma_200_current is not None else None,
+            "rsi": rsi,
+            "sma_50": sma_50,
+            "sma_200": sma_200,
             "ma_signal": ma_signal,
             "macd_signal": macd_signal,
             "bbands_signal": bbands_signal,
-            "current_price": round(current_price, 2),
+            "current_price": price,
         }
         
         return indicators
     except Exception as e:
-        print(f"Error calculating technical indicators: {e}")
+        logger.error("Error calculating technical indicators: %s", e)
         return {}
 
 
@@ -222,14 +194,16 @@ def get_price_trend(data: pd.DataFrame, months: int = 6) -> str:
         return "Unknown"
     
     try:
-        # Get data for specified months
-        period_data = data.tail(months * 21)  # Approximate trading days per month
+        # Only the window's endpoints are needed: index the close array
+        # instead of copying the last rows with tail()
+        window = months * 21  # Approximate trading days per month
+        closes = data["Close"].to_numpy()
         
-        if len(period_data) < 2:
+        if closes.size < 2:
             return "Insufficient data"
         
-        start_price = period_data["Close"].iloc[0]
-        end_price = period_data["Close"].iloc[-1]
+        start_price = closes[max(0, closes.size - window)]
+        end_price = closes[-1]
         change_pct = ((end_price - start_price) / start_price) * 100
         
         if change_pct > 5:
@@ -239,26 +213,23 @@ def get_price_trend(data: pd.DataFrame, months: int = 6) -> str:
         else:
             return f"Sideways ({months}M)"
     except Exception as e:
-        print(f"Error determining price trend: {e}")
+        logger.error("Error determining price trend: %s", e)
         return "Unknown"
 
 
-def get_market_data(ticker: str) -> Dict[str, Any]:
+def _build_market_data(ticker: str, price_data: Optional[pd.DataFrame],
+                       valuation: Dict[str, Any]) -> Dict[str, Any]:
     """
-    Get comprehensive market data for a ticker.
+    Combine fetched price history and valuation into the market_data dict.
     
     Args:
         ticker: Stock ticker symbol
+        price_data: DataFrame with OHLCV data (or None)
+        valuation: Valuation metrics dictionary
     
     Returns:
         Dictionary with all market data metrics
     """
-    # Fetch price data
-    price_data = fetch_stock_data(ticker, period="1y")
-    
-    # Get valuation metrics
-    valuation = get_valuation_metrics(ticker)
-    
     # Calculate technical indicators
     indicators = calculate_technical_indicators(price_data) if price_data is not None else {}
     
@@ -275,3 +246,48 @@ def get_market_data(ticker: str) -> Dict[str, Any]:
     }
     
     return market_data
+
+
+@cached(ttl=MARKET_DATA_TTL, name="market_data", cache_if=lambda v: v.get("data_available"))
+def get_market_data(ticker: str) -> Dict[str, Any]:
+    """
+    Get comprehensive market data for a ticker.
+    
+    Args:
+        ticker: Stock ticker symbol
+    
+    Returns:
+        Dictionary with all market data metrics
+    """
+    # Price history (with the beta benchmark, for the risk metrics) and
+    # valuation are independent requests - fetch them concurrently
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        price_future = executor.submit(fetch_stock_data, ticker, "1y", (BENCHMARK,))
+        valuation_future = executor.submit(get_valuation_metrics, ticker)
+        price_data = price_future.result()
+        valuation = valuation_future.result()
+    
+    return _build_market_data(ticker, price_data, valuation)
+
+
+@cached(ttl=MARKET_DATA_TTL, name="market_data", cache_if=lambda v: v.get("data_available"))
+async def get_market_data_async(ticker: str) -> Dict[str, Any]:
+    """
+    Async variant of get_market_data.
+    
+    yfinance has no async client, so the price history (one batched
+    download with the beta benchmark) and valuation requests run
+    concurrently on worker threads.
+    
+    Args:
+        ticker: Stock ticker symbol
+    
+    Returns:
+        Dictionary with all market data metrics
+    """
+    price_data, valuation = await asyncio.gather(
+        asyncio.to_thread(fetch_stock_data, ticker, "1y", (BENCHMARK,)),
+        asyncio.to_thread(get_valuation_metrics, ticker),
+    )
+    
+    return _build_market_data(ticker, price_data, valuation)
@@ -0,0 +1,264 @@
+"""
+Price History
+
+In-process TTL memo of yfinance price histories. The market data and risk
+metric tools read histories through get_history, so one ticker's history
+is fetched once per run instead of once per metric. get_histories loads
+several tickers (e.g. a stock and its beta benchmark) in one batched
+request. Fetches are single-flight per (ticker, period), so the shared
+BENCHMARK is downloaded once per HISTORY_TTL however many stocks are
+analyzed, concurrently or not.
+
+Histories are stored with a timezone-naive date index, so frames from
+Ticker.history and yf.download align with each other.
+
+yf.Ticker objects and their .info payloads are memoized too (get_ticker,
+get_info), so repeated valuation lookups skip the slow .info request.
+get_fast_info reads the price fields from the much lighter fast_info.
+"""
+
+import time
+import threading
+import yfinance as yf
+import pandas as pd
+from typing import Any, Dict, List, Optional, Tuple
+
+# How long a fetched history is reused within one process
+HISTORY_TTL = 10 * 60
+
+# How long a fetched .info payload is reused within one process
+INFO_TTL = 10 * 60
+
+# Benchmark for beta (S&P 500)
+BENCHMARK = "SPY"
+
+# Valuation field -> yfinance fast_info attribute
+FAST_INFO_FIELDS = {
+    "current_price": "last_price",
+    "market_cap": "market_cap",
+    "52_week_high": "year_high",
+    "52_week_low": "year_low",
+}
+
+# ticker -> (creation time, Ticker); yf.Ticker memoizes .info and
+# fast_info itself, so an entry is replaced after INFO_TTL
+_TICKER_CACHE: Dict[str, Tuple[float, yf.Ticker]] = {}
+# ticker -> (fetch time, info)
+_INFO_CACHE: Dict[str, Tuple[float, Dict[str, Any]]] = {}
+
+# (ticker, period) -> (fetch time, history)
+_HISTORY_CACHE: Dict[Tuple[str, str], Tuple[float, pd.DataFrame]] = {}
+_locks_lock = threading.Lock()
+_fetch_locks: Dict[Tuple[str, str], threading.Lock] = {}
+
+
+def get_ticker(ticker: str) -> yf.Ticker:
+    """Return the shared yf.Ticker for a symbol, recreated after INFO_TTL."""
+    entry = _TICKER_CACHE.get(ticker)
+    if entry is not None and time.time() - entry[0] < INFO_TTL:
+        return entry[1]
+
+    stock = yf.Ticker(ticker)
+    _TICKER_CACHE[ticker] = (time.time(), stock)
+    return stock
+
+
+def get_info(ticker: str) -> Dict[str, Any]:
+    """
+    Fetch a ticker's .info payload, reusing one fetched within INFO_TTL.
+
+    Args:
+        ticker: Stock ticker symbol
+
+    Returns:
+        yfinance info dictionary (shared - treat as read-only)
+    """
+    entry = _INFO_CACHE.get(ticker)
+    if entry is not None and time.time() - entry[0] < INFO_TTL:
+        return entry[1]
+
+    info = get_ticker(ticker).info
+    if info:
+        _INFO_CACHE[ticker] = (time.time(), info)
+    return info
+
+
+def get_fast_info(ticker: str) -> Dict[str, Optional[float]]:
+    """
+    Read price, market cap and 52-week range from a ticker's fast_info.
+
+    fast_info is backed by small chart/quote requests instead of the full
+    quoteSummary payload behind .info, and caches its values on the
+    shared Ticker, so prices are at most INFO_TTL old.
+
+    Args:
+        ticker: Stock ticker symbol
+
+    Returns:
+        Dictionary keyed like FAST_INFO_FIELDS; a field is None when
+        yfinance could not provide it
+    """
+    fast = get_ticker(ticker).fast_info
+    values: Dict[str, Optional[float]] = {}
+    for name, attr in FAST_INFO_FIELDS.items():
+        try:
+            value = getattr(fast, attr)
+        except Exception:
+            value = None
+        # fast_info reports missing numbers as NaN
+        values[name] = None if value is None or value != value else value
+    return values
+
+
+def _naive_index(data: pd.DataFrame) -> pd.DataFrame:
+    """Drop the index timezone (Ticker.history is tz-aware, yf.download is not)."""
+    if getattr(data.index, "tz", None) is not None:
+        data = data.tz_localize(None)
+    return data
+
+
+def _fresh(key: Tuple[str, str]) -> Optional[pd.DataFrame]:
+    entry = _HISTORY_CACHE.get(key)
+    if entry is not None and time.time() - entry[0] < HISTORY_TTL:
+        return entry[1]
+    return None
+
+
+def _fetch_lock(key: Tuple[str, str]) -> threading.Lock:
+    """Lock held while one caller fetches a (ticker, period) history."""
+    with _locks_lock:
+        return _fetch_locks.setdefault(key, threading.Lock())
+
+
+def get_history(ticker: str, period: str = "1y") -> Optional[pd.DataFrame]:
+    """
+    Fetch a ticker's price history, reusing a recent fetch.
+
+    Concurrent callers for the same (ticker, period) wait for a single
+    request. The returned DataFrame is shared - treat it as read-only.
+
+    Args:
+        ticker: Stock ticker symbol
+        period: yfinance history period (e.g. "6mo", "1y")
+
+    Returns:
+        DataFrame with OHLCV data (possibly empty) or None
+    """
+    key = (ticker, period)
+    data = _fresh(key)
+    if data is not None:
+        return data
+
+    with _fetch_lock(key):
+        # Another caller may have fetched it while we waited
+        data = _fresh(key)
+        if data is not None:
+            return data
+
+        data = get_ticker(ticker).history(period=period)
+        # Empty results are not memoized so the next call retries
+        if data is not None and not data.empty:
+            data = _naive_index(data)
+            _HISTORY_CACHE[key] = (time.time(), data)
+        return data
+
+
+def get_histories(tickers: List[str], period: str = "1y") -> Dict[str, Optional[pd.DataFrame]]:
+    """
+    Fetch several price histories, downloading the missing ones in one request.
+
+    Tickers with a recent memoized history are not re-downloaded; the rest
+    go through a single threaded yf.download call. A ticker another caller
+    is already fetching (e.g. the shared BENCHMARK while several stocks
+    are analyzed concurrently) is left out of the batch and its result is
+    awaited instead, so it is downloaded once per HISTORY_TTL.
+
+    Args:
+        tickers: Stock ticker symbols
+        period: yfinance history period (e.g. "6mo", "1y")
+
+    Returns:
+        Dictionary of ticker -> DataFrame with OHLCV data (or None)
+    """
+    histories: Dict[str, Optional[pd.DataFrame]] = {}
+    claimed: List[Tuple[str, threading.Lock]] = []
+    in_flight = []
+    for ticker in dict.fromkeys(tickers):
+        key = (ticker, period)
+        data = _fresh(key)
+        if data is None:
+            lock = _fetch_lock(key)
+            # Non-blocking: never wait on one ticker while holding another
+            if not lock.acquire(blocking=False):
+                in_flight.append(ticker)
+                continue
+            data = _fresh(key)
+            if data is None:
+                claimed.append((ticker, lock))
+                continue
+            lock.release()
+        histories[ticker] = data
+
+    try:
+        if claimed:
+            histories.update(_download(
+                [ticker for ticker, _ in claimed], period))
+    finally:
+        for _, lock in claimed:
+            lock.release()
+
+    # Wait for the callers already fetching these (get_history blocks on
+    # the same lock, then returns their memoized result)
+    for ticker in in_flight:
+        histories[ticker] = get_history(ticker, period)
+
+    return histories
+
+
+def _download(missing: List[str], period: str) -> Dict[str, Optional[pd.DataFrame]]:
+    """Download histories in one yf.download call and memoize the non-empty ones."""
+    batch = yf.download(
+        missing,
+        period=period,
+        group_by="ticker",
+        auto_adjust=True,
+        progress=False,
+        threads=True
+    )
+
+    histories: Dict[str, Optional[pd.DataFrame]] = {}
+    fetched_at = time.time()
+    for ticker in missing:
+        data = None
+        if batch is not None and not batch.empty:
+            if isinstance(batch.columns, pd.MultiIndex):
+                if ticker in batch.columns.get_level_values(0):
+                    # Rows where only other tickers traded are all-NaN here
+                    data = batch[ticker].dropna(how="all")
+            elif len(missing) == 1:
+                data = batch
+        if data is not None and not data.empty:
+            data = _naive_index(data)
+            _HISTORY_CACHE[(ticker, period)] = (fetched_at, data)
+        histories[ticker] = data
+
+    return histories
+
+
+def prefetch(tickers: List[str], period: str = "1y") -> int:
+    """
+    Warm the history memo for a batch run in one download.
+
+    Downloads every ticker plus BENCHMARK with a single yf.download call,
+    so the per-ticker market data and risk metric tools read memoized
+    histories instead of issuing their own requests.
+
+    Args:
+        tickers: Stock ticker symbols
+        period: yfinance history period (must match what the tools read)
+
+    Returns:
+        Number of tickers with a non-empty history
+    """
+    histories = get_histories([*tickers, BENCHMARK], period)
+    return sum(1 for data in histories.values() if data is not None and not data.empty)
@@ -7,43 +7,176 @@ Functions for computing risk metrics:
 - Max drawdown
 """
 
-import yfinance as yf
+import math
 import pandas as pd
 import numpy as np
-from typing import Dict, Any, Optional
+from typing import Dict, Any, Optional, Tuple
+from services.logger import logger
+from tools.cache import cached
+from tools.price_history import get_history, BENCHMARK
+from tools._njit import njit, NUMBA_AVAILABLE
 
+# Cache TTL for risk metrics (computed from 1y of daily closes)
+RISK_METRICS_TTL = 60 * 60
 
-def calculate_volatility(ticker: str, period: str = "1y") -> Optional[float]:
+# Trading days per year (annualizes daily volatility)
+TRADING_DAYS = 252
+
+
+if NUMBA_AVAILABLE:
+    @njit
+    def _running_max(prices: np.ndarray) -> np.ndarray:
+        out = np.empty_like(prices)
+        peak = prices[0]
+        for i in range(prices.size):
+            if prices[i] > peak:
+                peak = prices[i]
+            out[i] = peak
+        return out
+else:
+    _running_max = np.maximum.accumulate
+
+
+@njit
+def _risk_kernel(close: np.ndarray, pair_close: np.ndarray, bench_close: np.ndarray) -> np.ndarray:
+    """(volatility, beta, max drawdown), NaN where not computable."""
+    out = np.full(3, np.nan)
+    valid = ~np.isnan(close)
+    if not valid.any():
+        return out
+    
+    # Max drawdown: distance below the running peak,
+    # min((p - peak) / peak) == min(p / peak) - 1 with one temporary array
+    prices = close[valid]
+    running_max = _running_max(prices)
+    out[2] = (prices / running_max).min() - 1.0
+    
+    # Daily returns (NaN next to missing closes)
+    returns = np.diff(close) / close[:-1]
+    stock_ok = ~np.isnan(returns)
+    if stock_ok.sum() >= 2:
+        r = returns[stock_ok]
+        # Sample (ddof=1) variance from NumPy's var; math.sqrt on the scalar
+        n = r.size
+        out[0] = math.sqrt(r.var() * n / (n - 1) * TRADING_DAYS)
+    
+    # Beta from the stock/benchmark closes on their common dates (inner
+    # join; empty bench_close: skipped), so returns span the same interval
+    # for both. One joint mask replaces per-series dropna + re-merge; in
+    # cov/var the ddof cancels, so population moments give the same ratio
+    # as np.cov/np.var(ddof=1)
+    if bench_close.size > 0 and bench_close.size == pair_close.size:
+        pair_returns = np.diff(pair_close) / pair_close[:-1]
+        bench_returns = np.diff(bench_close) / bench_close[:-1]
+        pair = ~np.isnan(pair_returns) & ~np.isnan(bench_returns)
+        if pair.sum() >= 2:
+            rs = pair_returns[pair]
+            rb = bench_returns[pair]
+            rb_centered = rb - rb.mean()
+            variance = (rb_centered * rb_centered).mean()
+            if variance > 0:
+                out[1] = ((rs - rs.mean()) * rb_centered).mean() / variance
+    
+    return out
+
+
+def compute_risk_bundle(close: np.ndarray, pair_close: Optional[np.ndarray] = None,
+                        bench_close: Optional[np.ndarray] = None) -> Dict[str, Optional[float]]:
+    """
+    Compute volatility, beta and max drawdown from close prices in one pass.
+    
+    Volatility and drawdown use every stock close; beta uses the stock and
+    benchmark closes on their common dates. The kernel is JIT-compiled
+    when Numba is installed.
+    
+    Args:
+        close: Stock closes in date order
+        pair_close: Stock closes on the dates shared with the benchmark
+        bench_close: Benchmark closes on those same dates
+    
+    Returns:
+        Dictionary with volatility, beta and max_drawdown (negative
+        fraction); each is None when it cannot be computed
+    """
+    close = np.ascontiguousarray(close, dtype=np.float64)
+    if pair_close is None or bench_close is None:
+        pair_close = bench_close = np.empty(0)
+    pair_close = np.ascontiguousarray(pair_close, dtype=np.float64)
+    bench_close = np.ascontiguousarray(bench_close, dtype=np.float64)
+    
+    volatility, beta, max_drawdown = _risk_kernel(close, pair_close, bench_close)
+    return {
+        "volatility": None if np.isnan(volatility) else float(volatility),
+        "beta": None if np.isnan(beta) else float(beta),
+        "max_drawdown": None if np.isnan(max_drawdown) else float(max_drawdown),
+    }
+
+
+def _aligned_closes(stock_data: pd.DataFrame,
+                    benchmark_data: Optional[pd.DataFrame]) -> Tuple[np.ndarray, Optional[np.ndarray], Optional[np.ndarray]]:
+    """Stock closes, plus stock and benchmark closes on their common dates."""
+    close = stock_data["Close"].to_numpy()
+    if benchmark_data is None or benchmark_data.empty:
+        return close, None, None
+    # Index-aware inner join (dates only one side traded are dropped, as a
+    # merge would); no merged DataFrame is built
+    pair_close, bench_close = stock_data["Close"].align(benchmark_data["Close"], join="inner")
+    return close, pair_close.to_numpy(), bench_close.to_numpy()
+
+
+def _drawdown_info(max_drawdown: Optional[float]) -> Dict[str, Any]:
+    """Describe a max drawdown fraction as percent and severity."""
+    if max_drawdown is None:
+        return {"max_drawdown": None, "drawdown_pct": None, "severity": "Unknown"}
+    
+    max_drawdown_pct = abs(max_drawdown) * 100
+    
+    # Categorize severity
+    if max_drawdown_pct < 10:
+        severity = "Low"
+    elif max_drawdown_pct < 20:
+        severity = "Medium"
+    elif max_drawdown_pct < 30:
+        severity = "High"
+    else:
+        severity = "Very High"
+    
+    return {
+        "max_drawdown": max_drawdown,
+        "drawdown_pct": round(max_drawdown_pct, 2),
+        "severity": severity
+    }
+
+
+def calculate_volatility(ticker: str, period: str = "1y",
+                         data: Optional[pd.DataFrame] = None) -> Optional[float]:
     """
     Calculate annualized volatility.
     
     Args:
         ticker: Stock ticker symbol
         period: Time period for calculation
+        data: Price history to use instead of fetching it
     
     Returns:
         Annualized volatility (as decimal) or None if error
     """
     try:
-        stock = yf.Ticker(ticker)
-        data = stock.history(period=period)
+        if data is None:
+            data = get_history(ticker, period)
         
         if data is None or data.empty or len(data) < 2:
             return None
         
-        # Calculate daily returns
-        returns = data["Close"].pct_change().dropna()
-        
-        # Annualized volatility (assuming 252 trading days)
-        volatility = returns.std() * np.sqrt(252)
-        
-        return float(volatility)
+        return compute_risk_bundle(data["Close"].to_numpy())["volatility"]
     except Exception as e:
-        print(f"Error calculating volatility for {ticker}: {e}")
+        logger.error("Error calculating volatility for %s: %s", ticker, e)
         return None
 
 
-def calculate_beta(ticker: str, benchmark: str = "SPY", period: str = "1y") -> Optional[float]:
+def calculate_beta(ticker: str, benchmark: str = BENCHMARK, period: str = "1y",
+                   stock_data: Optional[pd.DataFrame] = None,
+                   benchmark_data: Optional[pd.DataFrame] = None) -> Optional[float]:
     """
     Calculate beta vs benchmark (default: S&P 500).
     
@@ -51,122 +184,84 @@ def calculate_beta(ticker: str, benchmark: str = "SPY", period: str = "1y") -> O
         ticker: Stock ticker symbol
         benchmark: Benchmark ticker (default: SPY for S&P 500)
         period: Time period for calculation
+        stock_data: Stock price history to use instead of fetching it
+        benchmark_data: Benchmark price history to use instead of fetching it
     
     Returns:
         Beta value or None if error
     """
     try:
-        stock = yf.Ticker(ticker)
-        benchmark_stock = yf.Ticker(benchmark)
-        
-        stock_data = stock.history(period=period)
-        benchmark_data = benchmark_stock.history(period=period)
+        if stock_data is None:
+            stock_data = get_history(ticker, period)
+        if benchmark_data is None:
+            benchmark_data = get_history(benchmark, period)
         
         if stock_data is None or stock_data.empty or benchmark_data is None or benchmark_data.empty:
             return None
         
-        # Align data by date
-        aligned = pd.merge(
-            stock_data[["Close"]],
-            benchmark_data[["Close"]],
-            left_index=True,
-            right_index=True,
-            suffixes=("_stock", "_benchmark")
-        )
-        
-        if len(aligned) < 2:
-            return None
-        
-        # Calculate returns
-        stock_returns = aligned["Close_stock"].pct_change().dropna()
-        benchmark_returns = aligned["Close_benchmark"].pct_change().dropna()
-        
-        # Align returns
-        aligned_returns = pd.merge(
-            stock_returns.to_frame("stock"),
-            benchmark_returns.to_frame("benchmark"),
-            left_index=True,
-            right_index=True
-        )
-        
-        if len(aligned_returns) < 2:
-            return None
-        
-        # Calculate covariance and variance
-        covariance = np.cov(aligned_returns["stock"], aligned_returns["benchmark"])[0][1]
-        benchmark_variance = np.var(aligned_returns["benchmark"])
-        
-        if benchmark_variance == 0:
-            return None
-        
-        beta = covariance / benchmark_variance
-        
-        return float(beta)
+        return compute_risk_bundle(*_aligned_closes(stock_data, benchmark_data))["beta"]
     except Exception as e:
-        print(f"Error calculating beta for {ticker}: {e}")
+        logger.error("Error calculating beta for %s: %s", ticker, e)
         return None
 
 
-def calculate_max_drawdown(ticker: str, period: str = "1y") -> Dict[str, Any]:
+def calculate_max_drawdown(ticker: str, period: str = "1y",
+                           data: Optional[pd.DataFrame] = None) -> Dict[str, Any]:
     """
     Calculate maximum drawdown.
     
     Args:
         ticker: Stock ticker symbol
         period: Time period for calculation
+        data: Price history to use instead of fetching it
     
     Returns:
         Dictionary with max drawdown info
     """
     try:
-        stock = yf.Ticker(ticker)
-        data = stock.history(period=period)
+        if data is None:
+            data = get_history(ticker, period)
         
         if data is None or data.empty:
-            return {"max_drawdown": None, "drawdown_pct": None, "severity": "Unknown"}
-        
-        # Calculate running maximum
-        running_max = data["Close"].expanding().max()
-        
-        # Calculate drawdown
-        drawdown = (data["Close"] - running_max) / running_max
-        
-        max_drawdown = drawdown.min()
-        max_drawdown_pct = abs(max_drawdown) * 100
+            return _drawdown_info(None)
         
-        # Categorize severity
-        if max_drawdown_pct < 10:
-            severity = "Low"
-        elif max_drawdown_pct < 20:
-            severity = "Medium"
-        elif max_drawdown_pct < 30:
-            severity = "High"
-        else:
-            severity = "Very High"
-        
-        return {
-            "max_drawdown": float(max_drawdown),
-            "drawdown_pct": round(max_drawdown_pct, 2),
-            "severity": severity
-        }
+        return _drawdown_info(compute_risk_bundle(data["Close"].to_numpy())["max_drawdown"])
     except Exception as e:
-        print(f"Error calculating max drawdown for {ticker}: {e}")
-        return {"max_drawdown": None, "drawdown_pct": None, "severity": "Unknown"}
+        logger.error("Error calculating max drawdown for %s: %s", ticker, e)
+        return _drawdown_info(None)
 
 
+@cached(ttl=RISK_METRICS_TTL, cache_if=lambda v: v.get("volatility") is not None)
 def get_risk_metrics(ticker: str) -> Dict[str, Any]:
     """
     Get comprehensive risk metrics for a ticker.
     
+    The 1y histories (shared with the market data tool via get_history)
+    are read once and all three metrics come from one compute_risk_bundle
+    pass.
+    
     Args:
         ticker: Stock ticker symbol
     
     Returns:
         Dictionary with all risk metrics
     """
-    volatility = calculate_volatility(ticker)
-    beta = calculate_beta(ticker)
-    drawdown_info = calculate_max_drawdown(ticker)
+    bundle = {"volatility": None, "beta": None, "max_drawdown": None}
+    try:
+        data = get_history(ticker, "1y")
+        if data is not None and not data.empty:
+            try:
+                benchmark_data = get_history(BENCHMARK, "1y")
+            except Exception as e:
+                logger.error("Error fetching benchmark history: %s", e)
+                benchmark_data = None
+            bundle = compute_risk_bundle(*_aligned_closes(data, benchmark_data))
+    except Exception as e:
+        logger.error("Error calculating risk metrics for %s: %s", ticker, e)
+    
+    volatility = bundle["volatility"]
+    beta = bundle["beta"]
+    drawdown_info = _drawdown_info(bundle["max_drawdown"])
     
     risk_metrics = {
         "volatility": round(volatility, 4) if volatility is not None else None,
@@ -5,8 +5,59 @@ Functions for analyzing market sentiment.
 Uses Hugging Face Mistral for lightweight sentiment analysis.
 """
 
+import json
+import time
+from functools import lru_cache
 from typing import Dict, Any
-from services.llm_service import get_hf_service
+from services.logger import logger
+from services.llm_service import get_hf_service, strip_json_fence
+
+# Sentiment is reused for the same ticker/context within a 30-minute bucket
+SENTIMENT_BUCKET_SECONDS = 30 * 60
+
+# Simple, direct prompt (no reasoning chains); filled with str.format
+PROMPT_TEMPLATE = """Analyze sentiment for {ticker}:
+{context}
+
+Return JSON: {{"sentiment": "positive|neutral|negative", "score": 0.0-1.0}}"""
+
+
+def _classify_sentiment(ticker: str, context: str) -> str:
+    """Call the LLM and map its answer to a sentiment label; API errors propagate."""
+    hf_service = get_hf_service()
+    
+    logger.info("[Macro Sentiment Agent] Calling Hugging Face API...")
+    
+    prompt = PROMPT_TEMPLATE.format(ticker=ticker, context=context)
+
+    response_text = hf_service.invoke(prompt, temperature=0.3)
+    
+    # Try to parse JSON, fallback to simple text parsing
+    try:
+        try:
+            result = json.loads(response_text)
+        except json.JSONDecodeError:
+            # Remove markdown code blocks if present (one precompiled regex scan)
+            result = json.loads(strip_json_fence(response_text))
+        sentiment_val = result.get("sentiment", "neutral")
+        
+        # Map to expected categories
+        if sentiment_val == "positive":
+            return "Neutral-positive"
+        elif sentiment_val == "negative":
+            return "Neutral-negative"
+        else:
+            return "Neutral"
+    except (json.JSONDecodeError, KeyError, IndexError, AttributeError):
+        # Not JSON (or not a JSON object) - extract sentiment from text,
+        # case-folded once for all the keyword checks
+        response_lower = response_text.casefold()
+        if "positive" in response_lower or "bullish" in response_lower:
+            return "Neutral-positive"
+        elif "negative" in response_lower or "bearish" in response_lower:
+            return "Neutral-negative"
+        else:
+            return "Neutral"
 
 
 def analyze_sentiment_with_llm(ticker: str, context: str = "") -> str:
@@ -22,47 +73,33 @@ def analyze_sentiment_with_llm(ticker: str, context: str = "") -> str:
         Sentiment description
     """
     try:
-        hf_service = get_hf_service()
-        
-        print(f"[Macro Sentiment Agent] Calling Hugging Face API...")
-        
-        # Simple, direct prompt (no reasoning chains)
-        prompt = f"""Analyze sentiment for {ticker}:
-{context}
+        return _classify_sentiment(ticker, context)
+    except Exception as e:
+        logger.error("Error analyzing sentiment: %s", e)
+        return "Neutral"
 
-Return JSON: {{"sentiment": "positive|neutral|negative", "score": 0.0-1.0}}"""
 
-        response_text = hf_service.invoke(prompt, temperature=0.3)
-        
-        # Try to parse JSON, fallback to simple text parsing
-        try:
-            import json
-            # Remove markdown code blocks if present
-            if "```json" in response_text:
-                response_text = response_text.split("```json")[1].split("```")[0].strip()
-            elif "```" in response_text:
-                response_text = response_text.split("```")[1].split("```")[0].strip()
-            
-            result = json.loads(response_text)
-            sentiment_val = result.get("sentiment", "neutral")
-            
-            # Map to expected categories
-            if sentiment_val == "positive":
-                return "Neutral-positive"
-            elif sentiment_val == "negative":
-                return "Neutral-negative"
-            else:
-                return "Neutral"
-        except:
-            # Fallback: try to extract sentiment from text
-            response_lower = response_text.lower()
-            if "positive" in response_lower or "bullish" in response_lower:
-                return "Neutral-positive"
-            elif "negative" in response_lower or "bearish" in response_lower:
-                return "Neutral-negative"
-            else:
-                return "Neutral"
-        
+@lru_cache(maxsize=256)
+def _bucketed_sentiment(ticker: str, context: str, bucket: int) -> str:
+    # Raises on API errors, so lru_cache never memoizes the fallback
+    return _classify_sentiment(ticker, context)
+
+
+def get_sentiment(ticker: str, context: str = "") -> str:
+    """
+    Cached analyze_sentiment_with_llm (30-minute buckets per ticker/context).
+    
+    Failed calls are not cached; the next call retries the API.
+    
+    Args:
+        ticker: Stock ticker symbol
+        context: Additional context about the stock
+    
+    Returns:
+        Sentiment description
+    """
+    try:
+        return _bucketed_sentiment(ticker, context, int(time.time() // SENTIMENT_BUCKET_SECONDS))
     except Exception as e:
-        print(f"Error analyzing sentiment: {e}")
+        logger.error("Error analyzing sentiment: %s", e)
         return "Neutral"